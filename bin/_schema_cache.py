@@ -0,0 +1,432 @@
+"""Inlined OpenAPI component schemas shared by the example generators.
+
+Inlining every schema in ``public/openapi/openapi.json`` is the slowest part of
+start-up for both ``generate_examples.py`` and ``generate_curl_snippets.py``, so
+the result is cached on disk under ``.cache/inlined_schemas/`` (keyed by the
+hash of the spec and of this module) and in memory for the lifetime of the process.
+"""
+
+import copy
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib encoder is used otherwise
+    orjson = None
+
+ROOT = Path(__file__).parent.parent
+OPENAPI_PATH = ROOT / "public" / "openapi" / "openapi.json"
+INLINED_CACHE_DIR = ROOT / ".cache" / "inlined_schemas"
+INLINED_CACHE_KEEP = 3
+# Below this size process start-up costs more than inlining serially.
+INLINE_PARALLEL_MIN_SCHEMAS = 500
+
+JSONValue = Any
+SchemaMap = Dict[str, JSONValue]
+RefCache = Dict[Tuple[str, str], JSONValue]
+
+# Plain component refs with no nested pointer and no escaped characters.
+SCHEMA_REF_RE = re.compile(r"^#/components/schemas/([^/~]+)$")
+
+SCALAR_TYPES = (str, int, float, bool, type(None))
+LEAF_DICT_MAX_KEYS = 3
+# Flyweight pool of small scalar-only dicts (e.g. {"type": "string"}), shared
+# across all inlined schemas. Keys include value types so 1 and True differ.
+_leaf_dicts: Dict[Tuple[Tuple[str, type, Any], ...], Dict[str, JSONValue]] = {}
+
+
+def json_loads(raw: bytes | str) -> JSONValue:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def json_dumps(value: JSONValue, *, pretty: bool = False) -> str:
+    """Serialize ``value`` as UTF-8 JSON text, two-space indented if ``pretty``."""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(value, option=option).decode("utf-8")
+    if pretty:
+        return json.dumps(value, indent=2, ensure_ascii=False)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_openapi(raw: bytes | None = None) -> dict[str, Any]:
+    if raw is None:
+        raw = OPENAPI_PATH.read_bytes()
+    return json_loads(raw)
+
+
+def load_schemas(openapi_doc: dict[str, Any]) -> SchemaMap:
+    components = openapi_doc.get("components")
+    if not isinstance(components, dict):
+        raise ValueError("OpenAPI document is missing 'components'.")
+    schemas = components.get("schemas")
+    if not isinstance(schemas, dict):
+        raise ValueError("OpenAPI document is missing 'components.schemas'.")
+    return schemas
+
+
+def deep_clone(value: JSONValue) -> JSONValue:
+    return copy.deepcopy(value)
+
+
+def unescape_pointer_token(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def resolve_pointer(root: JSONValue, pointer: str) -> JSONValue:
+    if pointer in ("", "#"):
+        return root
+
+    if pointer.startswith("#"):
+        pointer = pointer[1:]
+
+    if not pointer.startswith("/"):
+        raise ValueError(f"Unsupported JSON pointer format '{pointer}'")
+
+    tokens = [unescape_pointer_token(token) for token in pointer[1:].split("/")]
+    current: JSONValue = root
+    for token in tokens:
+        if isinstance(current, list):
+            index = int(token)
+            current = current[index]
+        elif isinstance(current, dict):
+            if token not in current:
+                raise KeyError(f"Unable to resolve pointer segment '{token}'")
+            current = current[token]
+        else:
+            raise KeyError(f"Unable to resolve pointer segment '{token}'")
+    return current
+
+
+# Inlined schemas are shared between every node that references them, so
+# nothing returned from the functions below may be mutated in place. Callers
+# that need an independent tree should clone it (see inline_all_schemas).
+
+
+def inline_schema_internal(
+    schema_name: str,
+    schemas: SchemaMap,
+    cache: Dict[str, JSONValue],
+    ref_cache: RefCache,
+    stack: List[str],
+) -> JSONValue:
+    if schema_name in cache:
+        return cache[schema_name]
+
+    if schema_name in stack:
+        cycle = " -> ".join([*stack, schema_name])
+        raise ValueError(f"Circular $ref detected: {cycle}")
+
+    schema = schemas.get(schema_name)
+    if schema is None:
+        raise KeyError(f"Missing schema for $ref '{schema_name}'")
+
+    stack.append(schema_name)
+    inlined = inline_node(schema, schema_name, schemas, cache, ref_cache, stack)
+    inlined = ensure_object_additional_properties(inlined)
+    stack.pop()
+    cache[schema_name] = inlined
+    return inlined
+
+
+def resolve_schema_pointer(
+    schema_name: str,
+    pointer: str,
+    schemas: SchemaMap,
+    cache: Dict[str, JSONValue],
+    ref_cache: RefCache,
+    stack: List[str],
+) -> JSONValue:
+    key = (schema_name, pointer)
+    if key in ref_cache:
+        return ref_cache[key]
+
+    resolved = resolve_pointer(
+        inline_schema_internal(schema_name, schemas, cache, ref_cache, stack),
+        pointer,
+    )
+    ref_cache[key] = resolved
+    return resolved
+
+
+def resolve_ref(
+    ref: str,
+    current_schema: str,
+    schemas: SchemaMap,
+    cache: Dict[str, JSONValue],
+    ref_cache: RefCache,
+    stack: List[str],
+) -> JSONValue:
+    match = SCHEMA_REF_RE.match(ref)
+    if match is not None:
+        return inline_schema_internal(match.group(1), schemas, cache, ref_cache, stack)
+
+    path_part, _, pointer_part = ref.partition("#")
+    target_schema = path_part or current_schema
+
+    if pointer_part.startswith("/components/schemas/"):
+        tokens = [unescape_pointer_token(token) for token in pointer_part.split("/") if token]
+        # tokens: ["components", "schemas", "SchemaName", ...]
+        if len(tokens) < 3:
+            raise KeyError(f"Unable to resolve pointer '{pointer_part}'")
+        schema_name = tokens[2]
+        pointer = "/" + "/".join(tokens[3:]) if len(tokens) > 3 else ""
+        return resolve_schema_pointer(schema_name, pointer, schemas, cache, ref_cache, stack)
+
+    if target_schema in stack:
+        return {"$ref": ref}
+
+    pointer = pointer_part if pointer_part == "" or pointer_part.startswith("/") else f"/{pointer_part}"
+    return resolve_schema_pointer(target_schema, pointer, schemas, cache, ref_cache, stack)
+
+
+def intern_leaf(value: JSONValue) -> JSONValue:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def intern_leaf_dict(value: Dict[str, JSONValue]) -> Dict[str, JSONValue]:
+    key = tuple((name, type(item), item) for name, item in value.items())
+    shared = _leaf_dicts.get(key)
+    if shared is None:
+        # Pooled dicts are shared across schemas, so they are finished here, before
+        # pooling: the additionalProperties pass then finds nothing to add to them.
+        shared = ensure_object_additional_properties(
+            {name: intern_leaf(item) for name, item in value.items()}
+        )
+        _leaf_dicts[key] = shared
+    return shared
+
+
+def inline_node(
+    node: JSONValue,
+    current_schema: str,
+    schemas: SchemaMap,
+    cache: Dict[str, JSONValue],
+    ref_cache: RefCache,
+    stack: List[str],
+) -> JSONValue:
+    # Walk with an explicit work stack of (output container, slot, source node).
+    # Output containers are created up front with placeholder slots so dict key
+    # order is fixed before their children are filled in.
+    root: List[JSONValue] = [None]
+    work: List[Tuple[Any, Any, JSONValue]] = [(root, 0, node)]
+
+    while work:
+        parent, slot, value = work.pop()
+
+        if isinstance(value, list):
+            out_list: List[JSONValue] = [None] * len(value)
+            parent[slot] = out_list
+            work.extend((out_list, index, item) for index, item in enumerate(value))
+            continue
+
+        if isinstance(value, dict):
+            ref_value = value.get("$ref")
+            if isinstance(ref_value, str):
+                resolved = resolve_ref(ref_value, current_schema, schemas, cache, ref_cache, stack)
+                rest = {key: item for key, item in value.items() if key != "$ref"}
+                if not rest:
+                    parent[slot] = resolved
+                    continue
+                all_of: List[JSONValue] = [resolved, None]
+                parent[slot] = {"allOf": all_of}
+                work.append((all_of, 1, rest))
+                continue
+
+            if len(value) <= LEAF_DICT_MAX_KEYS and all(
+                isinstance(item, SCALAR_TYPES) for item in value.values()
+            ):
+                parent[slot] = intern_leaf_dict(value)
+                continue
+
+            keys = list(value)
+            if isinstance(value.get("allOf"), list):
+                # allOf segments are emitted after the sibling keys.
+                keys.remove("allOf")
+                keys.append("allOf")
+            out_dict: Dict[str, JSONValue] = {}
+            for key in keys:
+                out_dict[key] = None
+                work.append((out_dict, key, value[key]))
+            parent[slot] = out_dict
+            continue
+
+        # Scalars are immutable, so they can be shared as-is.
+        parent[slot] = intern_leaf(value)
+
+    return root[0]
+
+
+def count_schema_refs(schemas: SchemaMap) -> Counter[str]:
+    counts: Counter[str] = Counter()
+    pending: List[JSONValue] = list(schemas.values())
+    while pending:
+        current = pending.pop()
+        if isinstance(current, list):
+            pending.extend(current)
+        elif isinstance(current, dict):
+            ref_value = current.get("$ref")
+            if isinstance(ref_value, str):
+                match = SCHEMA_REF_RE.match(ref_value)
+                if match is not None:
+                    counts[match.group(1)] += 1
+            pending.extend(current.values())
+    return counts
+
+
+def inline_schema_shard(
+    shard: Tuple[List[str], SchemaMap, Dict[str, JSONValue]],
+) -> SchemaMap:
+    names, schemas, seed = shard
+    cache = dict(seed)
+    ref_cache: RefCache = {}
+    return {
+        name: inline_schema_internal(name, schemas, cache, ref_cache, [])
+        for name in names
+    }
+
+
+def inline_schemas_parallel(schemas: SchemaMap, workers: int) -> SchemaMap:
+    # Workers don't share a cache, so inline the schemas that are referenced
+    # from several places once here and hand them to every worker as a seed.
+    cache: Dict[str, JSONValue] = {}
+    ref_cache: RefCache = {}
+    for name, count in count_schema_refs(schemas).items():
+        if count > 1 and name in schemas:
+            inline_schema_internal(name, schemas, cache, ref_cache, [])
+
+    names = list(schemas)
+    shards = [(names[index::workers], schemas, cache) for index in range(workers)]
+    merged: SchemaMap = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for inlined in executor.map(inline_schema_shard, shards):
+            merged.update(inlined)
+
+    # Unpickling keeps subtrees shared within a shard's result, so clone each schema
+    # to hand back independent trees, the same as the serial path.
+    return {name: deep_clone(merged[name]) for name in names}
+
+
+def inline_schemas(openapi_doc: dict[str, Any]) -> SchemaMap:
+    # Don't keep the previous document's leaf dicts alive in the pool.
+    _leaf_dicts.clear()
+    schemas = load_schemas(openapi_doc)
+
+    workers = os.cpu_count() or 1
+    if workers > 1 and len(schemas) >= INLINE_PARALLEL_MIN_SCHEMAS:
+        return inline_schemas_parallel(schemas, workers)
+
+    cache: Dict[str, JSONValue] = {}
+    ref_cache: RefCache = {}
+    result: SchemaMap = {}
+
+    for schema_name in schemas:
+        inlined = inline_schema_internal(schema_name, schemas, cache, ref_cache, [])
+        result[schema_name] = deep_clone(inlined)
+
+    return result
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """Write ``path`` through a sibling temp file so readers never see a partial file."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def read_inlined_cache(cache_path: Path) -> SchemaMap | None:
+    try:
+        cached = json_loads(cache_path.read_bytes())
+    except (OSError, json.JSONDecodeError):
+        return None
+    # Bump the mtime so the most recently used entries survive pruning.
+    os.utime(cache_path)
+    return cached
+
+
+def write_inlined_cache(cache_path: Path, schemas: SchemaMap) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    write_text_atomic(cache_path, json_dumps(schemas))
+
+    entries = sorted(
+        cache_path.parent.glob("*.json"),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for stale in entries[INLINED_CACHE_KEEP:]:
+        stale.unlink(missing_ok=True)
+
+
+def openapi_fingerprint(raw: bytes | None = None) -> str:
+    """Hash of the spec and of this module, so inlining changes invalidate caches too."""
+    if raw is None:
+        raw = OPENAPI_PATH.read_bytes()
+    digest = hashlib.sha1(raw)
+    digest.update(Path(__file__).read_bytes())
+    return digest.hexdigest()
+
+
+def inline_all_schemas() -> SchemaMap:
+    raw = OPENAPI_PATH.read_bytes()
+    cache_path = INLINED_CACHE_DIR / f"{openapi_fingerprint(raw)}.json"
+
+    cached = read_inlined_cache(cache_path)
+    if cached is not None:
+        return cached
+
+    result = inline_schemas(load_openapi(raw))
+    write_inlined_cache(cache_path, result)
+    return result
+
+
+@functools.lru_cache(maxsize=1)
+def get_inlined_schemas() -> SchemaMap:
+    """Inlined component schemas, computed (or read from disk) once per process.
+
+    The result is shared by every caller and must not be mutated.
+    """
+    return inline_all_schemas()
+
+
+def ensure_object_additional_properties(node: JSONValue) -> JSONValue:
+    # Mutates in place: inline_node always hands us freshly built containers,
+    # and any cached subtrees or pooled leaf dicts they share have already been
+    # through this pass, so nothing shared is written to.
+    pending: List[JSONValue] = [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, list):
+            pending.extend(current)
+            continue
+        if not isinstance(current, dict):
+            continue
+
+        pending.extend(current.values())
+
+        type_value = current.get("type")
+        is_object_type = False
+        if isinstance(type_value, str):
+            is_object_type = type_value == "object"
+        elif isinstance(type_value, list):
+            is_object_type = any(t == "object" for t in type_value if isinstance(t, str))
+
+        if not is_object_type and (
+            "properties" in current or "patternProperties" in current
+        ):
+            is_object_type = True
+
+        if is_object_type and "additionalProperties" not in current:
+            current["additionalProperties"] = False
+
+    return node
@@ -4,9 +4,10 @@
 The script reads a YAML configuration file describing the examples you want,
 calls the OpenAI Responses API to synthesize representative `curl` snippets,
 and writes the results to `public/curl_snippets/<name>.sh`. Each declared
-schema dependency is automatically inlined (mirroring bin/generate_examples.py)
-and provided as context. A manifest file tracks the digest of each example so
-snippets are regenerated only when the YAML entry or any schema dependency changes.
+schema dependency is automatically inlined (shared with bin/generate_examples.py)
+and provided as context. A manifest (one digest file per example under
+`public/curl_snippets/manifest/`) tracks the digest of each example so snippets
+are regenerated only when the YAML entry or any schema dependency changes.
 
 Usage:
     python bin/generate_curl_snippets.py
@@ -17,30 +18,48 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import hashlib
-import json
-import re
 from pathlib import Path
-from typing import Any, Dict, List, Mapping
+from typing import Any, Awaitable, Dict, List, Mapping
 
 import yaml
 from openai import AsyncOpenAI, BadRequestError
 
-from generate_examples import inline_all_schemas
+try:
+    # libyaml-backed loader; PyYAML only ships it when built against libyaml-dev.
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+from _schema_cache import get_inlined_schemas, json_dumps, json_loads, openapi_fingerprint
+from generate_examples import (
+    REQUESTS_PER_MINUTE,
+    TOKENS_PER_MINUTE,
+    TokenBucket,
+    create_openai_client,
+    create_response,
+    estimate_tokens,
+    hash_canonical,
+    new_digest,
+    read_sharded_manifest,
+    write_manifest_entries,
+)
 
 ROOT = Path(__file__).resolve().parent.parent
 CONFIG_PATH = ROOT / "public/curl_snippets" / "curl_snippets.yaml"
 OUTPUT_DIR = ROOT / "public" / "curl_snippets"
-MANIFEST_PATH = OUTPUT_DIR / "manifest.json"
+MANIFEST_DIR = OUTPUT_DIR / "manifest"
+# Single-file manifest written by older versions; migrated on first read.
+LEGACY_MANIFEST_PATH = OUTPUT_DIR / "manifest.json"
 
 DEFAULT_MODEL = "gpt-4.1"
-MAX_CONCURRENCY = 4
+MAX_CONCURRENCY = 50
+MAX_OUTPUT_TOKENS = 600
 
 INSTRUCTIONS = """
 You produce cURL command examples for the OpenResponses API.
 
 Requirements:
-- Return only the cURL command, no prose or Markdown fences.
+- Put only the cURL command in the `curl` field, with no prose or Markdown fences.
 - Use Bourne shell line continuations (`\\`) so the snippet is copy-pasteable.
 - Include headers that are typically required (`Authorization`, `Content-Type`,
   and any other critical ones).
@@ -58,6 +77,19 @@ Requirements:
 - Always use --data with a json string, NOT heredoc
 """.strip()
 
+# Structured output keeps fences and prose out of the snippet.
+SNIPPET_FORMAT = {
+    "type": "json_schema",
+    "name": "curl_snippet",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {"curl": {"type": "string"}},
+        "required": ["curl"],
+        "additionalProperties": False,
+    },
+}
+
 
 def ensure_output_dir() -> None:
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -70,7 +102,7 @@ def load_examples() -> List[Dict[str, Any]]:
             "Create it with a list of examples."
         )
 
-    data = yaml.safe_load(CONFIG_PATH.read_text()) or []
+    data = yaml.load(CONFIG_PATH.read_text(), Loader=YamlLoader) or []
     if not isinstance(data, list):
         raise SystemExit("curl_snippets.yaml must contain a top-level list.")
 
@@ -110,11 +142,11 @@ def load_examples() -> List[Dict[str, Any]]:
     return normalized
 
 
-def load_schema_dependencies(
+def resolve_schema_dependencies(
     names: List[str],
     inlined_schemas: Mapping[str, Any],
-) -> Dict[str, str]:
-    payloads: Dict[str, str] = {}
+) -> Dict[str, Any]:
+    dependencies: Dict[str, Any] = {}
     for name in names:
         schema = inlined_schemas.get(name)
         if schema is None:
@@ -122,44 +154,42 @@ def load_schema_dependencies(
                 f"Schema dependency '{name}' not found. Update curl_snippets.yaml "
                 "or ensure the schema exists in public/openapi/openapi.json."
             )
-        payloads[name] = json.dumps(schema, indent=2, ensure_ascii=False)
-    return payloads
+        dependencies[name] = schema
+    return dependencies
+
+
+def load_schema_dependencies(dependencies: Mapping[str, Any]) -> Dict[str, str]:
+    return {name: json_dumps(schema, pretty=True) for name, schema in dependencies.items()}
 
 
-def compute_digest(example: Mapping[str, Any], dependencies: Mapping[str, str]) -> str:
-    digest = hashlib.sha1()
-    digest.update(json.dumps(example, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+def compute_digest(example: Mapping[str, Any], dependencies: Mapping[str, Any]) -> str:
+    digest = new_digest()
+    hash_canonical(example, digest)
     for dep_name in sorted(dependencies):
         digest.update(dep_name.encode("utf-8"))
-        digest.update(dependencies[dep_name].encode("utf-8"))
+        hash_canonical(dependencies[dep_name], digest)
     return digest.hexdigest()
 
 
-def read_manifest() -> Dict[str, str]:
-    if not MANIFEST_PATH.exists():
-        return {}
-    try:
-        return json.loads(MANIFEST_PATH.read_text() or "{}")
-    except json.JSONDecodeError as exc:
-        raise SystemExit(f"Failed to parse manifest at {MANIFEST_PATH}: {exc}") from exc
+def compute_fast_key(example: Mapping[str, Any], spec_fingerprint: str) -> str:
+    """Cheap stand-in for compute_digest that hashes the spec file, not the schemas."""
+    digest = new_digest()
+    hash_canonical(example, digest)
+    digest.update(spec_fingerprint.encode("utf-8"))
+    return digest.hexdigest()
 
 
-def write_manifest(manifest: Mapping[str, str]) -> None:
-    ensure_output_dir()
-    MANIFEST_PATH.write_text(json.dumps(dict(manifest), indent=2))
+def read_manifest() -> Dict[str, str]:
+    return read_sharded_manifest(MANIFEST_DIR, LEGACY_MANIFEST_PATH)
 
 
-def strip_code_fences(text: str) -> str:
-    trimmed = text.strip()
-    if trimmed.startswith("```"):
-        trimmed = re.sub(r"^```[\w-]*\n", "", trimmed)
-        trimmed = re.sub(r"\n```$", "", trimmed)
-    return trimmed.strip()
+def write_manifest(entries: Dict[str, str]) -> None:
+    write_manifest_entries(MANIFEST_DIR, entries)
 
 
 def build_prompt(example: Mapping[str, Any], schemas: Mapping[str, str]) -> str:
     metadata = example.get("metadata") or {}
-    metadata_json = json.dumps(metadata, indent=2, ensure_ascii=False)
+    metadata_json = json_dumps(metadata, pretty=True)
     schema_blocks = []
     for name, content in schemas.items():
         schema_blocks.append(f"Schema '{name}':\n{content}")
@@ -181,25 +211,40 @@ async def generate_snippet(
     output_path: Path,
     client: AsyncOpenAI,
     sem: asyncio.Semaphore,
-) -> None:
+    bucket: TokenBucket,
+    manifest_entry: str,
+) -> bool:
+    """Generate and write one snippet, then record its manifest entry.
+
+    Returns False instead of raising on failure and leaves the previous
+    manifest entry in place, so the next run retries the snippet.
+    """
     prompt = build_prompt(example, schema_payloads)
 
-    async with sem:
-        print(f"generating curl snippet for {example['name']}")
-        response = await client.responses.create(
-            model=DEFAULT_MODEL,
-            input=prompt,
-            instructions=INSTRUCTIONS,
-            store=False,
-            max_output_tokens=600,
-        )
-        snippet = strip_code_fences(response.output_text)
-
-    if not snippet.lower().startswith("curl "):
-        snippet = f"curl {snippet.lstrip()}" if "curl" not in snippet.lower() else snippet
+    try:
+        async with sem:
+            print(f"generating curl snippet for {example['name']}")
+            response = await create_response(
+                client,
+                bucket,
+                estimate_tokens(INSTRUCTIONS, prompt) + MAX_OUTPUT_TOKENS,
+                model=DEFAULT_MODEL,
+                input=prompt,
+                instructions=INSTRUCTIONS,
+                store=False,
+                max_output_tokens=MAX_OUTPUT_TOKENS,
+                text={"format": SNIPPET_FORMAT},
+            )
+            snippet = json_loads(response.output_text)["curl"]
 
-    ensure_output_dir()
-    output_path.write_text(f"{snippet.rstrip()}\n")
+        ensure_output_dir()
+        output_path.write_text(f"{snippet.rstrip()}\n")
+        # Flush per snippet so work survives an interrupted run.
+        write_manifest({example["name"]: manifest_entry})
+    except Exception as exc:
+        print(f"Failed to generate curl snippet for {example['name']}: {type(exc).__name__}: {exc}")
+        return False
+    return True
 
 
 async def main() -> None:
@@ -213,41 +258,59 @@ async def main() -> None:
         return
 
     manifest = read_manifest()
-    inlined_schemas = inline_all_schemas()
-    client = AsyncOpenAI()
+    spec_fingerprint = openapi_fingerprint()
     sem = asyncio.Semaphore(MAX_CONCURRENCY)
-    updated_manifest: Dict[str, str] = dict(manifest)
+    bucket = TokenBucket(rate_rpm=REQUESTS_PER_MINUTE, rate_tpm=TOKENS_PER_MINUTE)
+    # Entries are "<digest> <fast key>"; older manifests only have the digest.
+    refreshed_manifest: Dict[str, str] = {}
+    pending: List[Awaitable[bool]] = []
 
-    async with asyncio.TaskGroup() as tg:
+    async with create_openai_client(MAX_CONCURRENCY) as client:
         for example in examples:
-            schema_payloads = load_schema_dependencies(
-                example["dependencies"],
-                inlined_schemas,
-            )
             digest_payload = {
                 "name": example["name"],
                 "description": example["description"],
                 "metadata": example["metadata"],
                 "dependencies": example["dependencies"],
             }
-            digest = compute_digest(digest_payload, schema_payloads)
-
             output_path = OUTPUT_DIR / f"{example['name']}.sh"
+            recorded_digest, _, recorded_fast_key = manifest.get(example["name"], "").partition(" ")
+            fast_key = compute_fast_key(digest_payload, spec_fingerprint)
+
+            # Same entry and same spec file: skip serializing and hashing the schemas.
+            if (
+                not args.force
+                and recorded_fast_key == fast_key
+                and output_path.exists()
+            ):
+                continue
+
+            # Only now pay for inlining (cached per process) and hashing the schemas.
+            dependencies = resolve_schema_dependencies(example["dependencies"], get_inlined_schemas())
+            digest = compute_digest(digest_payload, dependencies)
+
             needs_update = (
                 args.force
-                or manifest.get(example["name"]) != digest
+                or recorded_digest != digest
                 or not output_path.exists()
             )
 
+            manifest_entry = f"{digest} {fast_key}"
             if needs_update:
-                tg.create_task(
-                    generate_snippet(example, schema_payloads, output_path, client, sem)
+                schema_payloads = load_schema_dependencies(dependencies)
+                pending.append(
+                    generate_snippet(
+                        example, schema_payloads, output_path, client, sem, bucket, manifest_entry
+                    )
                 )
+            else:
+                refreshed_manifest[example["name"]] = manifest_entry
 
-            updated_manifest[example["name"]] = digest
-
-    write_manifest(updated_manifest)
+        # Snippets record their own manifest entries as they finish; a failure
+        # neither cancels its siblings nor discards their results.
+        await asyncio.gather(*pending, return_exceptions=True)
 
+    write_manifest(refreshed_manifest)
 
 if __name__ == "__main__":
     asyncio.run(main())
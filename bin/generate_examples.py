@@ -1,242 +1,214 @@
 import argparse
 import json
+import os
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any
 import hashlib
 import asyncio
+import importlib.util
 import json.decoder
+import random
+import time
 
+import httpx
 import openai
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from _schema_cache import (
+    JSONValue,
+    get_inlined_schemas,
+    json_dumps,
+    write_text_atomic,
+)
 
 ROOT = Path(__file__).parent.parent
-OPENAPI_PATH = ROOT / "public" / "openapi" / "openapi.json"
 EXAMPLES_DIR = ROOT / "public" / "examples"
+# One "<schema>.digest" file per example, so a run only rewrites what changed.
+MANIFEST_DIR = EXAMPLES_DIR / "manifest"
+MANIFEST_SUFFIX = ".digest"
+
+# Default account limits for the throttle, shared with generate_curl_snippets.py
+# since both scripts draw on the same account; override here with --rpm / --tpm.
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200_000
+MAX_CONNECTIONS = 50
+# The examples call does not set max_output_tokens, so budget a typical size.
+EXAMPLE_OUTPUT_TOKENS = 1024
+REPAIR_OUTPUT_MARGIN_TOKENS = 256
+# Schemas at most this many prompt tokens are packed MICRO_BATCH_SIZE to a call.
+MICRO_BATCH_SIZE = 8
+MICRO_BATCH_MAX_SCHEMA_TOKENS = 200
+REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+MAX_API_ATTEMPTS = 5
+RETRYABLE_API_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)
+BATCH_POLL_SECONDS = 30
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def hash_canonical(value: JSONValue, digest: Any) -> None:
+    """Feed a canonical (sorted-key) encoding of ``value`` into ``digest``.
+
+    Equivalent to hashing ``json.dumps(value, sort_keys=True)`` for change
+    detection, without materializing the whole document as one string.
+    """
+    if isinstance(value, dict):
+        digest.update(b"{")
+        for key in sorted(value):
+            digest.update(json.dumps(key, ensure_ascii=False).encode("utf-8"))
+            digest.update(b":")
+            hash_canonical(value[key], digest)
+            digest.update(b",")
+        digest.update(b"}")
+    elif isinstance(value, list):
+        digest.update(b"[")
+        for item in value:
+            hash_canonical(item, digest)
+            digest.update(b",")
+        digest.update(b"]")
+    else:
+        digest.update(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def new_digest() -> Any:
+    return hashlib.blake2b(digest_size=20)
+
+
+def schema_hash(schema: JSONValue) -> str:
+    digest = new_digest()
+    hash_canonical(schema, digest)
+    return digest.hexdigest()
 
-JSONValue = Any
-SchemaMap = Dict[str, JSONValue]
-
-
-def load_openapi() -> dict[str, Any]:
-    return json.loads(OPENAPI_PATH.read_text())
-
-
-def load_schemas(openapi_doc: dict[str, Any]) -> SchemaMap:
-    components = openapi_doc.get("components")
-    if not isinstance(components, dict):
-        raise ValueError("OpenAPI document is missing 'components'.")
-    schemas = components.get("schemas")
-    if not isinstance(schemas, dict):
-        raise ValueError("OpenAPI document is missing 'components.schemas'.")
-    return schemas
-
-
-def deep_clone(value: JSONValue) -> JSONValue:
-    return json.loads(json.dumps(value))
-
-
-def unescape_pointer_token(token: str) -> str:
-    return token.replace("~1", "/").replace("~0", "~")
-
-
-def resolve_pointer(root: JSONValue, pointer: str) -> JSONValue:
-    if pointer in ("", "#"):
-        return deep_clone(root)
-
-    if pointer.startswith("#"):
-        pointer = pointer[1:]
-
-    if not pointer.startswith("/"):
-        raise ValueError(f"Unsupported JSON pointer format '{pointer}'")
-
-    tokens = [unescape_pointer_token(token) for token in pointer[1:].split("/")]
-    current: JSONValue = root
-    for token in tokens:
-        if isinstance(current, list):
-            index = int(token)
-            current = current[index]
-        elif isinstance(current, dict):
-            if token not in current:
-                raise KeyError(f"Unable to resolve pointer segment '{token}'")
-            current = current[token]
-        else:
-            raise KeyError(f"Unable to resolve pointer segment '{token}'")
-    return deep_clone(current)
-
-
-def inline_schema_internal(
-    schema_name: str,
-    schemas: SchemaMap,
-    cache: Dict[str, JSONValue],
-    stack: List[str],
-) -> JSONValue:
-    if schema_name in cache:
-        cached = cache[schema_name]
-        if not stack and isinstance(cached, dict) and "allOf" in cached:
-            cache.pop(schema_name)
-        else:
-            return cached
-
-    if schema_name in stack:
-        cycle = " -> ".join([*stack, schema_name])
-        raise ValueError(f"Circular $ref detected: {cycle}")
-
-    schema = schemas.get(schema_name)
-    if schema is None:
-        raise KeyError(f"Missing schema for $ref '{schema_name}'")
-
-    stack.append(schema_name)
-    inlined = inline_node(schema, schema_name, schemas, cache, stack)
-    inlined = ensure_object_additional_properties(inlined)
-    stack.pop()
-    cache[schema_name] = inlined
-    return inlined
-
-
-def resolve_ref(
-    ref: str,
-    current_schema: str,
-    schemas: SchemaMap,
-    cache: Dict[str, JSONValue],
-    stack: List[str],
-) -> JSONValue:
-    path_part, _, pointer_part = ref.partition("#")
-    target_schema = path_part or current_schema
-
-    if pointer_part.startswith("/components/schemas/"):
-        tokens = [unescape_pointer_token(token) for token in pointer_part.split("/") if token]
-        # tokens: ["components", "schemas", "SchemaName", ...]
-        if len(tokens) < 3:
-            raise KeyError(f"Unable to resolve pointer '{pointer_part}'")
-        schema_name = tokens[2]
-        resolved_schema = deep_clone(
-            inline_schema_internal(schema_name, schemas, cache, stack)
-        )
-        if len(tokens) == 3:
-            return resolved_schema
-        pointer = "/" + "/".join(tokens[3:])
-        return resolve_pointer(resolved_schema, pointer)
-
-    if target_schema in stack:
-        return {"$ref": ref}
-
-    resolved_schema = deep_clone(
-        inline_schema_internal(target_schema, schemas, cache, stack)
-    )
-
-    if pointer_part == "":
-        return resolved_schema
-
-    pointer = pointer_part if pointer_part.startswith("/") else f"/{pointer_part}"
-    return resolve_pointer(resolved_schema, pointer)
-
-
-def inline_node(
-    node: JSONValue,
-    current_schema: str,
-    schemas: SchemaMap,
-    cache: Dict[str, JSONValue],
-    stack: List[str],
-) -> JSONValue:
-    if isinstance(node, list):
-        return [
-            inline_node(item, current_schema, schemas, cache, stack) for item in node
-        ]
-
-    if isinstance(node, dict):
-        ref_value = node.get("$ref")
-        if isinstance(ref_value, str):
-            rest = {key: value for key, value in node.items() if key != "$ref"}
-            resolved = resolve_ref(ref_value, current_schema, schemas, cache, stack)
-            if not rest:
-                return resolved
-            inlined_rest = inline_node(rest, current_schema, schemas, cache, stack)
-            return {"allOf": [resolved, inlined_rest]}
-
-        all_of = node.get("allOf")
-        if isinstance(all_of, list):
-            inlined = {
-                key: inline_node(value, current_schema, schemas, cache, stack)
-                for key, value in node.items()
-                if key != "allOf"
-            }
-            inlined["allOf"] = [
-                inline_node(segment, current_schema, schemas, cache, stack) for segment in all_of
-            ]
-            return inlined
-
-        return {
-            key: inline_node(value, current_schema, schemas, cache, stack)
-            for key, value in node.items()
-        }
-
-    return deep_clone(node)
-
-
-def inline_all_schemas() -> SchemaMap:
-    openapi_doc = load_openapi()
-    schemas = load_schemas(openapi_doc)
-    cache: Dict[str, JSONValue] = {}
-    result: SchemaMap = {}
-
-    for schema_name in schemas:
-        result[schema_name] = inline_schema_internal(schema_name, schemas, cache, [])
-
-    return result
-
-
-def ensure_object_additional_properties(node: JSONValue) -> JSONValue:
-    if isinstance(node, list):
-        return [ensure_object_additional_properties(item) for item in node]
-
-    if isinstance(node, dict):
-        processed: Dict[str, JSONValue] = {}
-        for key, value in node.items():
-            processed[key] = ensure_object_additional_properties(value)
-
-        type_value = processed.get("type")
-        is_object_type = False
-        if isinstance(type_value, str):
-            is_object_type = type_value == "object"
-        elif isinstance(type_value, list):
-            is_object_type = any(t == "object" for t in type_value if isinstance(t, str))
-
-        if not is_object_type and (
-            "properties" in processed or "patternProperties" in processed
-        ):
-            is_object_type = True
-
-        if is_object_type and "additionalProperties" not in processed:
-            processed["additionalProperties"] = False
 
+def read_sharded_manifest(manifest_dir: Path, legacy_path: Path) -> dict[str, str]:
+    """Read a manifest stored as one ``<key>.digest`` file per entry.
 
-        return processed
+    A single-file ``legacy_path`` manifest from older runs is split into
+    shards on first read so its digests are not lost.
+    """
+    if legacy_path.exists():
+        try:
+            legacy = json.loads(legacy_path.read_text() or "{}")
+        except json.JSONDecodeError as exc:
+            raise SystemExit(f"Failed to parse manifest at {legacy_path}: {exc}") from exc
+        write_manifest_entries(manifest_dir, legacy)
+        legacy_path.unlink()
 
-    return node
+    manifest: dict[str, str] = {}
+    if not manifest_dir.is_dir():
+        return manifest
+    with os.scandir(manifest_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(MANIFEST_SUFFIX):
+                with open(entry.path, encoding="utf-8") as digest_buffer:
+                    manifest[entry.name[: -len(MANIFEST_SUFFIX)]] = digest_buffer.read().strip()
+    return manifest
 
 
-def schema_hash(schema: str) -> str:
-    digest = hashlib.new("sha-1")
-    digest.update(schema.encode('utf-8'))
-    return digest.hexdigest()
+def write_manifest_entries(manifest_dir: Path, entries: dict[str, str]) -> None:
+    """Atomically (re)write only the given manifest entries."""
+    manifest_dir.mkdir(parents=True, exist_ok=True)
+    for key, digest in entries.items():
+        write_text_atomic(manifest_dir / f"{key}{MANIFEST_SUFFIX}", digest)
 
 
 def read_manifest() -> dict[str, str]:
-    manifest_filepath = EXAMPLES_DIR / "manifest.json"
-    if not manifest_filepath.exists():
-        manifest_filepath.touch()
-        return {}
-
-    with open(manifest_filepath, 'r') as manifest_buffer:
-        if len(manifest_buffer.read()) == 0:
-            return {}
+    return read_sharded_manifest(MANIFEST_DIR, EXAMPLES_DIR / "manifest.json")
+
+
+def write_manifest(entries: dict[str, str]) -> None:
+    write_manifest_entries(MANIFEST_DIR, entries)
+
+
+def estimate_tokens(*texts: str) -> int:
+    # Rough rule of thumb (~4 characters per token); only used for throttling.
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+class TokenBucket:
+    """Proactive requests-per-minute / tokens-per-minute throttle.
+
+    Both budgets refill continuously and ``acquire`` waits until a call fits
+    in each of them, so bursts are smoothed out before the API answers with a
+    429. ``penalize`` halves the refill rate for ``penalty_seconds`` after a
+    rate-limit error (additive recovery happens when the window expires).
+    """
+
+    def __init__(self, *, rate_rpm: float, rate_tpm: float, penalty_seconds: float = 60.0) -> None:
+        self.rate_rpm = rate_rpm
+        self.rate_tpm = rate_tpm
+        self.penalty_seconds = penalty_seconds
+        self._requests = float(rate_rpm)
+        self._tokens = float(rate_tpm)
+        self._scale = 1.0
+        self._penalty_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self._scale < 1.0 and now >= self._penalty_until:
+            self._scale = 1.0
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rate_rpm, self._requests + elapsed * self.rate_rpm * self._scale / 60)
+        self._tokens = min(self.rate_tpm, self._tokens + elapsed * self.rate_tpm * self._scale / 60)
+
+    async def acquire(self, tokens: int) -> None:
+        # A single call larger than the whole budget must still be able to run.
+        tokens = min(tokens, int(self.rate_tpm))
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait_requests = (1 - self._requests) * 60 / (self.rate_rpm * self._scale)
+                wait_tokens = (tokens - self._tokens) * 60 / (self.rate_tpm * self._scale)
+                await asyncio.sleep(max(wait_requests, wait_tokens, 0.01))
+
+    def penalize(self) -> None:
+        self._scale = max(self._scale / 2, 1 / 64)
+        self._penalty_until = time.monotonic() + self.penalty_seconds
+
+
+def create_openai_client(max_connections: int) -> AsyncOpenAI:
+    """Build a client whose connection pool matches our concurrency cap.
+
+    HTTP/2 lets concurrent requests multiplex over a few sockets; it needs the
+    optional ``h2`` package (``pip install 'httpx[http2]'``).
+    """
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max(1, max_connections // 2),
+        ),
+        timeout=REQUEST_TIMEOUT,
+        http2=importlib.util.find_spec("h2") is not None,
+    )
+    # create_response retries (and throttles) every attempt itself; SDK retries
+    # would multiply the attempts and bypass the TokenBucket.
+    return AsyncOpenAI(http_client=http_client, max_retries=0)
 
-        manifest_buffer.seek(0)
-        return json.load(manifest_buffer)
 
-def write_manifest(manifest: dict[str, str]) -> None:
-    with open(EXAMPLES_DIR/"manifest.json", 'w') as manifest_buffer:
-        json.dump(manifest, manifest_buffer, indent=2)
+async def create_response(
+    openai_client: AsyncOpenAI,
+    bucket: TokenBucket,
+    request_tokens: int,
+    **request: Any,
+) -> Any:
+    """Call ``responses.create`` through the throttle, retrying transient errors."""
+    for attempt in range(MAX_API_ATTEMPTS):
+        await bucket.acquire(request_tokens)
+        try:
+            return await openai_client.responses.create(**request)
+        except RETRYABLE_API_ERRORS as e:
+            if isinstance(e, openai.RateLimitError):
+                bucket.penalize()
+            if attempt == MAX_API_ATTEMPTS - 1:
+                raise
+            delay = min(60, 2**attempt + random.random())
+            print(f"{type(e).__name__} (attempt {attempt + 1}/{MAX_API_ATTEMPTS}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
 
 
 INSTRUCTIONS = """
@@ -258,95 +230,312 @@ def parse_json_output(payload: str) -> JSONValue:
         obj, _ = decoder.raw_decode(text)
         return obj
 
+
+def example_request(schema: dict[str, Any], *, strict: bool) -> dict[str, Any]:
+    return {
+        "model": "gpt-4.1-mini" if strict else "gpt-4.1",
+        "input": "please create an example object of the following format",
+        "store": False,
+        "instructions": INSTRUCTIONS,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "example_schema",
+                "strict": strict,
+                "schema": schema
+            }
+        }
+    }
+
+
+def write_example(key: str, example: JSONValue) -> None:
+    with open(f"{EXAMPLES_DIR / key}.json", 'w', encoding="utf-8") as example_buffer:
+        example_buffer.write(json_dumps(example, pretty=True))
+
+
+def repair_request(schema: dict[str, Any], bad_output: str, *, strict: bool) -> dict[str, Any]:
+    request = example_request(schema, strict=strict)
+    request.update(
+        model="gpt-4.1-mini",
+        input=f"Fix this to valid JSON matching the schema: {bad_output}",
+        # The repaired object is about as long as the broken one.
+        max_output_tokens=estimate_tokens(bad_output) + REPAIR_OUTPUT_MARGIN_TOKENS,
+    )
+    del request["instructions"]
+    return request
+
+
 async def generate_schema_example(
     key: str,
     schema: dict[str, Any],
     openai_client: AsyncOpenAI,
     sema: asyncio.Semaphore,
+    bucket: TokenBucket,
     *,
     max_parse_attempts: int = 3,
-) -> None:
+) -> bool:
+    """Generate and write one example; returns False instead of raising on failure.
+
+    Unparseable output is first sent back for a cheap repair; only the final
+    attempt regenerates the example from scratch.
+    """
+    request_tokens = estimate_tokens(INSTRUCTIONS, json_dumps(schema)) + EXAMPLE_OUTPUT_TOKENS
+
+    async def generate() -> tuple[Any, bool]:
+        try:
+            response = await create_response(
+                openai_client, bucket, request_tokens, **example_request(schema, strict=True)
+            )
+            return response, True
+        except openai.BadRequestError:
+            print("Falling back to non-strict")
+            response = await create_response(
+                openai_client, bucket, request_tokens, **example_request(schema, strict=False)
+            )
+            return response, False
+
     async with sema:
         print(f"generating {key}")
         parsed: JSONValue | None = None
-        last_error: Exception | None = None
-
-        for attempt in range(1, max_parse_attempts + 1):
-            try:
-                response = await openai_client.responses.create(
-                    model="gpt-4.1-mini",
-                    input="please create an example object of the following format",
-                    store=False,
-                    instructions=INSTRUCTIONS,
-                    text={
-                        "format": {
-                            "type": "json_schema",
-                            "name": "example_schema",
-                            "strict": True,
-                            "schema": schema
-                        }
-                    }
-                )
-            except openai.BadRequestError:
-                print("Falling back to non-strict")
-                response = await openai_client.responses.create(
-                    model="gpt-4.1",
-                    input="please create an example object of the following format",
-                    store=False,
-                    instructions=INSTRUCTIONS,
-                    text={
-                        "format": {
-                            "type": "json_schema",
-                            "name": "example_schema",
-                            "strict": False,
-                            "schema": schema
-                        }
-                    }
-                )
-
-            try:
-                parsed = parse_json_output(response.output_text)
-                break
-            except Exception as e:
-                last_error = e
-                print(f"Failed to parse JSON for {key} (attempt {attempt}/{max_parse_attempts}): {e}")
-                if attempt == max_parse_attempts:
-                    return
 
-        with open(f"{EXAMPLES_DIR / key}.json", 'w') as example_buffer:
-            example_buffer.write(json.dumps(parsed, indent=2))
+        try:
+            response, strict = await generate()
+            for attempt in range(1, max_parse_attempts + 1):
+                output_text = response.output_text
+                try:
+                    parsed = parse_json_output(output_text)
+                    break
+                except Exception as e:
+                    print(f"Failed to parse JSON for {key} (attempt {attempt}/{max_parse_attempts}): {e}")
+                    if attempt == max_parse_attempts:
+                        return False
+
+                if attempt + 1 == max_parse_attempts:
+                    response, strict = await generate()
+                else:
+                    repair = repair_request(schema, output_text, strict=strict)
+                    response = await create_response(
+                        openai_client,
+                        bucket,
+                        estimate_tokens(repair["input"], json_dumps(schema)) + repair["max_output_tokens"],
+                        **repair,
+                    )
+        except Exception as e:
+            # Keep sibling tasks in the TaskGroup running; the caller retries next run.
+            print(f"Failed to generate {key}: {type(e).__name__}: {e}")
+            return False
+
+        write_example(key, parsed)
+        return True
+
+
+def group_small_schemas(
+    pending: dict[str, dict[str, Any]], group_size: int
+) -> list[dict[str, dict[str, Any]]]:
+    """Pack small schemas, smallest first, into groups of up to ``group_size``."""
+    if group_size < 2:
+        return []
+    sizes = {key: estimate_tokens(json_dumps(schema)) for key, schema in pending.items()}
+    small = sorted(
+        (key for key, size in sizes.items() if size <= MICRO_BATCH_MAX_SCHEMA_TOKENS),
+        key=sizes.__getitem__,
+    )
+    groups = [small[start:start + group_size] for start in range(0, len(small), group_size)]
+    return [{key: pending[key] for key in group} for group in groups if len(group) > 1]
+
+
+async def generate_schema_examples_group(
+    group: dict[str, dict[str, Any]],
+    openai_client: AsyncOpenAI,
+    sema: asyncio.Semaphore,
+    bucket: TokenBucket,
+) -> dict[str, bool]:
+    """Generate several small examples with one structured-output call.
+
+    Members missing from the combined answer fall back to one call each.
+    """
+    wrapper = {
+        "type": "object",
+        "properties": dict(group),
+        "required": list(group),
+        "additionalProperties": False,
+    }
+    request = example_request(wrapper, strict=True)
+    request["input"] = "please create an example object for each property of the following format"
+    request_tokens = estimate_tokens(INSTRUCTIONS, json_dumps(wrapper)) + EXAMPLE_OUTPUT_TOKENS
+
+    parsed: JSONValue = {}
+    async with sema:
+        print(f"generating {', '.join(group)}")
+        try:
+            response = await create_response(openai_client, bucket, request_tokens, **request)
+            parsed = parse_json_output(response.output_text)
+        except Exception as e:
+            print(f"Failed to generate group, retrying individually: {type(e).__name__}: {e}")
+
+    results: dict[str, bool] = {}
+    for key, schema in group.items():
+        example = parsed.get(key) if isinstance(parsed, dict) else None
+        if isinstance(example, dict):
+            write_example(key, example)
+            results[key] = True
+        else:
+            results[key] = await generate_schema_example(key, schema, openai_client, sema, bucket)
+    return results
+
+
+def batch_response_text(body: dict[str, Any]) -> str:
+    # Raw response bodies have no output_text convenience property.
+    return "".join(
+        part.get("text", "")
+        for item in body.get("output") or []
+        if item.get("type") == "message"
+        for part in item.get("content") or []
+        if part.get("type") == "output_text"
+    )
+
+
+async def generate_examples_batch(
+    pending: dict[str, dict[str, Any]],
+    openai_client: AsyncOpenAI,
+) -> set[str]:
+    """Generate examples through the Batch API.
+
+    Returns the keys that did not produce a usable example so the caller can
+    retry them through the regular per-request path.
+    """
+    lines = [
+        json.dumps(
+            {
+                "custom_id": key,
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": example_request(schema, strict=True),
+            }
+        )
+        for key, schema in pending.items()
+    ]
+    batch_file = await openai_client.files.create(
+        file=("examples.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
+    )
+    batch = await openai_client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h",
+    )
+    print(f"submitted batch {batch.id} with {len(lines)} examples")
+
+    while batch.status not in BATCH_TERMINAL_STATUSES:
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await openai_client.batches.retrieve(batch.id)
+        print(f"batch {batch.id}: {batch.status}")
+
+    failed = set(pending)
+    if batch.output_file_id is None:
+        return failed
+
+    output = await openai_client.files.content(batch.output_file_id)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        key = result.get("custom_id")
+        response = result.get("response") or {}
+        if key not in failed or response.get("status_code") != 200:
+            continue
+        try:
+            example = parse_json_output(batch_response_text(response.get("body") or {}))
+        except Exception as e:
+            print(f"Failed to parse JSON for {key} from batch: {e}")
+            continue
+        write_example(key, example)
+        failed.discard(key)
+
+    return failed
+
+
+def positive_rate(text: str) -> float:
+    # TokenBucket divides by both rates, so zero or negative limits are rejected up front.
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number, got {text!r}")
+    return value
+
 
 async def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--force" , "-f", action="store_true")
-    parser.add_argument("-n", "--parallelism", type=int, default=5)
+    parser.add_argument("-n", "--parallelism", type=int, default=MAX_CONNECTIONS)
+    parser.add_argument("--rpm", type=positive_rate, default=REQUESTS_PER_MINUTE)
+    parser.add_argument("--tpm", type=positive_rate, default=TOKENS_PER_MINUTE)
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Generate through the Batch API (cheaper, slower); failures fall back to direct calls.",
+    )
+    parser.add_argument(
+        "--group-size",
+        type=int,
+        default=MICRO_BATCH_SIZE,
+        help="Number of small schemas to generate per call (1 disables grouping).",
+    )
 
     parsed = parser.parse_args()
 
-    schemas = inline_all_schemas()
-    openai_client = AsyncOpenAI()
+    schemas = get_inlined_schemas()
     manifest = read_manifest()
-    sem = asyncio.Semaphore(max(1, parsed.parallelism))
-
-    async with asyncio.TaskGroup() as tg:
-        for key in sorted(schemas.keys()):
-            schema = schemas.get(key)
-
-            if schema.get("type") != "object":
-                continue
-            properties = schema.get("properties")
-            if not isinstance(properties, dict) or len(properties) == 0:
-                print(f"skipping {key} (empty object schema)")
-                continue
-
-            digest = schema_hash(json.dumps(schema, sort_keys=True))
+    parallelism = max(1, parsed.parallelism)
+    sem = asyncio.Semaphore(parallelism)
+    bucket = TokenBucket(rate_rpm=parsed.rpm, rate_tpm=parsed.tpm)
+
+    pending: dict[str, dict[str, Any]] = {}
+    updated: dict[str, str] = {}
+    for key in sorted(schemas.keys()):
+        schema = schemas.get(key)
+
+        if schema.get("type") != "object":
+            continue
+        properties = schema.get("properties")
+        if not isinstance(properties, dict) or len(properties) == 0:
+            print(f"skipping {key} (empty object schema)")
+            continue
+
+        digest = schema_hash(schema)
+
+        if parsed.force or key not in manifest or manifest.get(key) != digest or not (EXAMPLES_DIR/key).exists():
+            pending[key] = schema
+            updated[key] = digest
+
+    async with create_openai_client(parallelism) as openai_client:
+        if parsed.batch and pending:
+            failed = await generate_examples_batch(pending, openai_client)
+            pending = {key: pending[key] for key in sorted(failed)}
+
+        groups = group_small_schemas(pending, parsed.group_size)
+        grouped = {key for group in groups for key in group}
+
+        async with asyncio.TaskGroup() as tg:
+            group_tasks = [
+                tg.create_task(generate_schema_examples_group(group, openai_client, sem, bucket))
+                for group in groups
+            ]
+            tasks = {
+                key: tg.create_task(generate_schema_example(key, schema, openai_client, sem, bucket))
+                for key, schema in pending.items()
+                if key not in grouped
+            }
 
-            if parsed.force or key not in manifest or manifest.get(key) != digest or not (EXAMPLES_DIR/key).exists():
-                tg.create_task(generate_schema_example(key, schema, openai_client, sem))
+    results = {key: task.result() for key, task in tasks.items()}
+    for task in group_tasks:
+        results.update(task.result())
 
-                manifest[key] = digest
+    # A digest that can never match makes the next run retry failed examples.
+    for key, ok in results.items():
+        if not ok:
+            updated[key] = f"failed:{updated[key]}"
 
-        write_manifest(manifest)
+    write_manifest(updated)
 
 
 
@@ -24,10 +24,15 @@ import json
 import os
 import re
 import sys
-from copy import deepcopy
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
 
 
 Json = Union[dict[str, Any], list[Any], str, int, float, bool, None]
@@ -41,6 +46,7 @@ def _looks_like_url(ref: str) -> bool:
     return "://" in ref
 
 
+@lru_cache(maxsize=None)
 def _split_ref(ref: str) -> tuple[str, str]:
     """
     Split a $ref into (path_part, fragment_part_without_hash).
@@ -56,6 +62,7 @@ def _split_ref(ref: str) -> tuple[str, str]:
     return path, frag
 
 
+@lru_cache(maxsize=None)
 def _decode_json_pointer_token(token: str) -> str:
     # JSON Pointer escaping per RFC 6901
     return token.replace("~1", "/").replace("~0", "~")
@@ -92,24 +99,43 @@ def _json_pointer_get(doc: Json, pointer: str, *, context: str) -> Json:
     return cur
 
 
-def _load_document(path: Path) -> Json:
-    suffix = path.suffix.lower()
-    with path.open("r", encoding="utf-8") as f:
-        if suffix in (".json",):
-            return json.load(f)
-        if suffix in (".yaml", ".yml"):
-            try:
-                import yaml  # type: ignore
-            except Exception as e:  # pragma: no cover
-                raise RuntimeError(
-                    f"Cannot parse YAML file {path} because PyYAML is not installed. "
-                    f"Either convert to JSON or install pyyaml."
-                ) from e
-            return yaml.safe_load(f)
-        # Try JSON as a last resort.
-        return json.load(f)
+def _parse_json_bytes(raw: bytes) -> Json:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson rejects a few things the stdlib accepts (NaN, >64-bit ints); let json decide.
+            pass
+    return json.loads(raw)
 
 
+def _load_document(path: Path) -> Json:
+    suffix = path.suffix.lower()
+    if suffix in (".yaml", ".yml"):
+        try:
+            import yaml  # type: ignore
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError(
+                f"Cannot parse YAML file {path} because PyYAML is not installed. "
+                f"Either convert to JSON or install pyyaml."
+            ) from e
+        # Prefer the libyaml-backed loader when PyYAML was built with it.
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        # One read of the raw bytes; the loader decodes them itself (UTF-8 unless there is a BOM).
+        return yaml.load(path.read_bytes(), Loader=loader)
+    # JSON, and JSON as a last resort for unknown suffixes.
+    return _parse_json_bytes(path.read_bytes())
+
+
+@lru_cache(maxsize=None)
+def _resolve_ref_path(base_file: Path, path_part: str) -> Path:
+    """Absolute path of the file a $ref points into; an empty path_part means base_file itself."""
+    # Path.resolve() stats the filesystem, and the same (base, path) pairs recur for every ref.
+    target = base_file.parent / path_part if path_part else base_file
+    return target.resolve()
+
+
+@lru_cache(maxsize=None)
 def _is_relative_file_ref(ref: str) -> bool:
     """
     True for refs that point to another file using a relative path.
@@ -131,29 +157,132 @@ def _is_relative_file_ref(ref: str) -> bool:
     return not os.path.isabs(path_part)
 
 
+def _json_clone(node: Json) -> Json:
+    """
+    Deep-copy a JSON tree (dicts, lists and scalars only).
+    Much cheaper than copy.deepcopy, which goes through its generic memo/dispatch machinery.
+    """
+    if type(node) is dict:
+        return {k: _json_clone(v) for k, v in node.items()}
+    if type(node) is list:
+        return [_json_clone(v) for v in node]
+    return node
+
+
+def _ref_free_containers(doc: Json) -> set[int]:
+    """
+    Return the ids of every dict/list in doc whose subtree has no "$ref" key.
+    The walkers hand these subtrees through untouched instead of rebuilding them.
+    """
+    # Pre-order listing, then one reversed sweep: every child is decided before its parent.
+    order: list[Json] = []
+    stack: list[Json] = [doc] if isinstance(doc, (dict, list)) else []
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        children = node.values() if isinstance(node, dict) else node
+        stack.extend(child for child in children if isinstance(child, (dict, list)))
+
+    ref_free: set[int] = set()
+    for node in reversed(order):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                continue
+            children = node.values()
+        else:
+            children = node
+        for child in children:
+            if isinstance(child, (dict, list)) and id(child) not in ref_free:
+                break
+        else:
+            ref_free.add(id(node))
+    return ref_free
+
+
 def _deep_merge(base: Json, overlay: Json) -> Json:
     """
     Merge overlay onto base (dict-only deep merge). Non-dicts are replaced.
     This is used to keep sibling keys alongside a $ref, e.g.:
       { "$ref": "x.json", "description": "..." }
     """
-    if isinstance(base, dict) and isinstance(overlay, dict):
-        out: dict[str, Any] = dict(base)
-        for k, v in overlay.items():
-            if k in out:
-                out[k] = _deep_merge(out[k], v)
+    if overlay is base or not (isinstance(base, dict) and isinstance(overlay, dict)):
+        return overlay
+    out: dict[str, Any] = dict(base)
+    # Siblings are usually a couple of scalars, so only nested dict/dict pairs get copied.
+    work: list[tuple[dict[str, Any], dict[str, Any]]] = [(out, overlay)]
+    while work:
+        target, layer = work.pop()
+        for k, v in layer.items():
+            current = target.get(k)
+            if isinstance(v, dict) and isinstance(current, dict) and current is not v:
+                merged = dict(current)
+                target[k] = merged
+                work.append((merged, v))
             else:
-                out[k] = v
-        return out
-    return overlay
+                target[k] = v
+    return out
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class RefKey:
     abs_path: str
     pointer: str
 
 
+@lru_cache(maxsize=None)
+def _refkey(abs_path: str, pointer: str) -> RefKey:
+    # One shared instance per (abs_path, pointer); RefKey is frozen, so sharing is safe.
+    return RefKey(abs_path, pointer)
+
+
+# (id(node), base_file) -> (node, result). Holding the node keeps its id from being
+# reused. Results are shared between every place the same subtree is reached, and
+# ref-free subtrees of the cached documents are passed through as-is; that is safe
+# because _strip_x_properties rebuilds the tree before anything mutates it.
+TraverseCache = dict[tuple[int, str], tuple[Json, Json]]
+
+# Work-stack frame kinds for the iterative walks (RefInliner/RefBundler, _apply_allow_fields).
+_VISIT, _MEMO, _MERGE, _COMPONENT, _ALLOF, _EXIT, _ALLOW_PROPS = range(7)
+
+# RefInliner._ref_color states: a ref whose target is being expanded is on the DFS
+# path (a second visit is a cycle); once expanded it is done.
+_ON_STACK, _DONE = 1, 2
+
+
+class DocumentCache:
+    """
+    Parsed documents and resolved JSON Pointers, keyed by absolute path.
+
+    One instance can be shared by any number of RefInliner/RefBundler objects so each
+    file is parsed and indexed once per run. Cached documents must not be mutated.
+    """
+
+    def __init__(self) -> None:
+        self.docs: dict[str, Json] = {}
+        # ids of ref-free containers in the cached documents (kept alive by docs).
+        self.ref_free: set[int] = set()
+        # (abs_path, pointer) -> resolved node inside the cached document.
+        self._pointers: dict[tuple[str, str], Json] = {}
+
+    def load(self, abs_path: Path) -> Json:
+        key = str(abs_path)
+        if key not in self.docs:
+            doc = _load_document(abs_path)
+            self.docs[key] = doc
+            self.ref_free.update(_ref_free_containers(doc))
+        return self.docs[key]
+
+    def resolve(self, abs_path: Path, pointer: str, *, ref_value: str, base_file: Path) -> Json:
+        key = (str(abs_path), pointer)
+        try:
+            return self._pointers[key]
+        except KeyError:
+            pass
+        target = _json_pointer_get(self.load(abs_path), pointer, context=f"$ref '{ref_value}' from {base_file}")
+        self._pointers[key] = target
+        return target
+
+
 class RefInliner:
     def __init__(
         self,
@@ -161,23 +290,22 @@ class RefInliner:
         inline_internal_refs: bool = False,
         on_cycle: str = "keep",
         max_depth: int = 200,
+        documents: Optional[DocumentCache] = None,
     ) -> None:
         self.inline_internal_refs = inline_internal_refs
         self.on_cycle = on_cycle
         self.max_depth = max_depth
-        self._doc_cache: dict[str, Json] = {}
+        self._documents = documents if documents is not None else DocumentCache()
         self._cycle_warnings_emitted: set[tuple[str, str]] = set()
-
-    def _load_cached(self, abs_path: Path) -> Json:
-        key = str(abs_path)
-        if key not in self._doc_cache:
-            self._doc_cache[key] = _load_document(abs_path)
-        return self._doc_cache[key]
+        self._traverse_cache: TraverseCache = {}
+        self._cycle_cuts = 0
+        self._ref_color: dict[RefKey, int] = {}
 
     def inline(self, entrypoint: Path) -> Json:
         entry_abs = entrypoint.resolve()
-        doc = self._load_cached(entry_abs)
-        return self._inline_node(deepcopy(doc), base_file=entry_abs, stack=[], depth=0)
+        doc = self._documents.load(entry_abs)
+        self._traverse_cache.clear()
+        return self._inline_node(doc, base_file=entry_abs, depth=0)
 
     def resolve_ref(self, ref_value: str, *, base_file: Path) -> tuple[Json, Path]:
         """
@@ -188,47 +316,52 @@ class RefInliner:
         file that should be used as the base for resolving *relative-file* $refs
         inside resolved_node.
         """
-        path_part, frag = _split_ref(ref_value)
-
-        if path_part == "":
-            loaded = self._load_cached(base_file.resolve())
-            target = _json_pointer_get(loaded, frag, context=f"$ref '{ref_value}' from {base_file}")
-            return deepcopy(target), base_file.resolve()
+        target, abs_path = self._resolve_target(ref_value, base_file=base_file)
+        return _json_clone(target), abs_path
 
-        abs_path = (base_file.parent / path_part).resolve()
-        loaded = self._load_cached(abs_path)
-        target = _json_pointer_get(loaded, frag, context=f"$ref '{ref_value}' from {base_file}")
-        return deepcopy(target), abs_path
+    def _resolve_target(self, ref_value: str, *, base_file: Path) -> tuple[Json, Path]:
+        """Like resolve_ref, but returns the node inside the cached document itself."""
+        path_part, frag = _split_ref(ref_value)
+        abs_path = _resolve_ref_path(base_file, path_part)
+        return self._documents.resolve(abs_path, frag, ref_value=ref_value, base_file=base_file), abs_path
 
-    def _inline_ref_value(
+    def _enter_ref(
         self,
         ref_value: str,
         *,
         base_file: Path,
-        stack: list[RefKey],
         depth: int,
-    ) -> Json:
+    ) -> Optional[tuple[Json, Path, RefKey]]:
+        """
+        Check a $ref for cycles/depth and resolve its target.
+
+        Returns (target, target_base_file, key) for the caller to inline, or None when
+        the $ref should be kept as-is (internal ref without inline_internal_refs, or a
+        cycle with on_cycle="keep"). key is marked on-stack until the caller calls
+        _exit_ref.
+        """
         path_part, frag = _split_ref(ref_value)
 
         # Internal refs: optionally inline, but they are not "relative schemas".
         if path_part == "":
             if not self.inline_internal_refs:
-                return {"$ref": ref_value}
+                return None
             # Resolve within the current document.
-            abs_path = base_file.resolve()
-            key = RefKey(str(abs_path), frag)
+            abs_path = _resolve_ref_path(base_file, "")
+            key = _refkey(str(abs_path), frag)
         else:
-            abs_path = (base_file.parent / path_part).resolve()
-            key = RefKey(str(abs_path), frag)
+            abs_path = _resolve_ref_path(base_file, path_part)
+            key = _refkey(str(abs_path), frag)
 
-        if key in stack:
+        if self._ref_color.get(key) == _ON_STACK:
             msg = f"Cycle detected while resolving $ref '{ref_value}' from {base_file}."
             if self.on_cycle == "keep":
-                warn_key = (str(base_file.resolve()), ref_value)
+                self._cycle_cuts += 1
+                warn_key = (str(_resolve_ref_path(base_file, "")), ref_value)
                 if warn_key not in self._cycle_warnings_emitted:
                     self._cycle_warnings_emitted.add(warn_key)
                     _eprint(f"warning: {msg} Keeping original $ref.")
-                return {"$ref": ref_value}
+                return None
             raise RuntimeError(msg)
 
         if depth > self.max_depth:
@@ -236,49 +369,123 @@ class RefInliner:
                 f"Max depth exceeded ({self.max_depth}) while resolving $ref '{ref_value}' from {base_file}."
             )
 
-        loaded = self._load_cached(Path(key.abs_path))
         try:
-            target = _json_pointer_get(loaded, key.pointer, context=f"$ref '{ref_value}' from {base_file}")
+            target = self._documents.resolve(abs_path, frag, ref_value=ref_value, base_file=base_file)
         except Exception as e:
             raise RuntimeError(f"Failed to resolve $ref '{ref_value}' from {base_file}: {e}") from e
 
-        # Important: deepcopy to prevent mutation across multiple expansions.
-        inlined = self._inline_node(deepcopy(target), base_file=Path(key.abs_path), stack=stack + [key], depth=depth + 1)
+        self._ref_color[key] = _ON_STACK
+        # _inline_node never mutates its input, so the cached document can be walked directly.
+        return target, abs_path, key
+
+    def _exit_ref(self, key: RefKey) -> None:
+        self._ref_color[key] = _DONE
+
+    def _inline_ref_value(
+        self,
+        ref_value: str,
+        *,
+        base_file: Path,
+        depth: int,
+    ) -> Json:
+        entered = self._enter_ref(ref_value, base_file=base_file, depth=depth)
+        if entered is None:
+            return {"$ref": ref_value}
+        target, target_base_file, key = entered
+        inlined = self._inline_node(target, base_file=target_base_file, depth=depth + 1)
+        self._exit_ref(key)
         return inlined
 
-    def _inline_node(self, node: Json, *, base_file: Path, stack: list[RefKey], depth: int) -> Json:
-        if isinstance(node, dict):
-            if "$ref" in node and isinstance(node.get("$ref"), str):
-                ref_value = node["$ref"]
-
-                if _is_relative_file_ref(ref_value) or (self.inline_internal_refs and ref_value.startswith("#")):
-                    siblings = {k: v for k, v in node.items() if k != "$ref"}
-                    resolved = self._inline_ref_value(ref_value, base_file=base_file, stack=stack, depth=depth)
-                    if siblings:
-                        # Resolve siblings against the current base file (the container), not the referenced file.
-                        siblings_inlined = self._inline_node(siblings, base_file=base_file, stack=stack, depth=depth + 1)
-                        if isinstance(resolved, dict) and isinstance(siblings_inlined, dict):
-                            return _deep_merge(resolved, siblings_inlined)
-                        # If types conflict, let siblings win (best-effort).
-                        return siblings_inlined
-                    return resolved
-
-                # Non-relative refs are left intact, but we still should inline inside siblings (if any).
-                out: dict[str, Any] = {}
-                for k, v in node.items():
-                    if k == "$ref":
-                        out[k] = v
+    def _inline_node(self, node: Json, *, base_file: Path, depth: int) -> Json:
+        """
+        Return a copy of node with its $refs inlined.
+
+        Walks iteratively: visit frames write their result into parent[slot], and
+        finish frames (pushed beneath a node's children) run once the subtree is done.
+        """
+        root: list[Json] = [None]
+        work: list[tuple[Any, ...]] = [(_VISIT, node, base_file, depth, root, 0)]
+        memo = self._traverse_cache
+        ref_free = self._documents.ref_free
+        while work:
+            frame = work.pop()
+            op = frame[0]
+
+            if op == _MEMO:
+                _, memo_key, source, cycle_cuts, parent, slot = frame
+                # A subtree that cut a cycle depends on the refs above it; only cache complete expansions.
+                if self._cycle_cuts == cycle_cuts:
+                    memo[memo_key] = (source, parent[slot])
+                continue
+
+            if op == _EXIT:
+                self._exit_ref(frame[1])
+                continue
+
+            if op == _MERGE:
+                _, resolved_holder, siblings_holder, parent, slot = frame
+                resolved, siblings_inlined = resolved_holder[0], siblings_holder[0]
+                if isinstance(resolved, dict) and isinstance(siblings_inlined, dict):
+                    parent[slot] = _deep_merge(resolved, siblings_inlined)
+                else:
+                    # If types conflict, let siblings win (best-effort).
+                    parent[slot] = siblings_inlined
+                continue
+
+            _, node, base_file, depth, parent, slot = frame
+            if not isinstance(node, (dict, list)) or id(node) in ref_free:
+                parent[slot] = node
+                continue
+            memo_key = (id(node), str(base_file))
+            hit = memo.get(memo_key)
+            if hit is not None and hit[0] is node:
+                parent[slot] = hit[1]
+                continue
+            work.append((_MEMO, memo_key, node, self._cycle_cuts, parent, slot))
+
+            if isinstance(node, list):
+                out_list: list[Json] = [None] * len(node)
+                parent[slot] = out_list
+                for i in range(len(node) - 1, -1, -1):
+                    work.append((_VISIT, node[i], base_file, depth + 1, out_list, i))
+                continue
+
+            ref_value = node.get("$ref")
+            if isinstance(ref_value, str) and (
+                _is_relative_file_ref(ref_value) or (self.inline_internal_refs and ref_value.startswith("#"))
+            ):
+                # Most ref nodes are a bare {"$ref": ...}; only build siblings when there are any.
+                siblings = {k: v for k, v in node.items() if k != "$ref"} if len(node) > 1 else None
+                entered = self._enter_ref(ref_value, base_file=base_file, depth=depth)
+                if not siblings:
+                    if entered is None:
+                        parent[slot] = {"$ref": ref_value}
                     else:
-                        out[k] = self._inline_node(v, base_file=base_file, stack=stack, depth=depth + 1)
-                return out
+                        target, target_base_file, key = entered
+                        work.append((_EXIT, key))
+                        work.append((_VISIT, target, target_base_file, depth + 1, parent, slot))
+                    continue
 
-            # Regular dict: recurse all values.
-            return {k: self._inline_node(v, base_file=base_file, stack=stack, depth=depth + 1) for k, v in node.items()}
+                # Resolve siblings against the current base file (the container), not the referenced file.
+                resolved_holder: list[Json] = [None]
+                siblings_holder: list[Json] = [None]
+                work.append((_MERGE, resolved_holder, siblings_holder, parent, slot))
+                work.append((_VISIT, siblings, base_file, depth + 1, siblings_holder, 0))
+                if entered is None:
+                    resolved_holder[0] = {"$ref": ref_value}
+                else:
+                    target, target_base_file, key = entered
+                    work.append((_EXIT, key))
+                    work.append((_VISIT, target, target_base_file, depth + 1, resolved_holder, 0))
+                continue
 
-        if isinstance(node, list):
-            return [self._inline_node(v, base_file=base_file, stack=stack, depth=depth + 1) for v in node]
+            # Regular dict (or a ref we leave intact): copy keys in order, inlining every value.
+            out: dict[str, Any] = dict.fromkeys(node)
+            parent[slot] = out
+            for k, v in reversed(node.items()):
+                work.append((_VISIT, v, base_file, depth + 1, out, k))
 
-        return node
+        return root[0]
 
 
 _OPENAPI_COMPONENT_KEYS: set[str] = {
@@ -294,6 +501,7 @@ _OPENAPI_COMPONENT_KEYS: set[str] = {
 }
 
 
+@lru_cache(maxsize=None)
 def _component_group_for_abs_path(abs_path: Path) -> Optional[str]:
     """
     If abs_path looks like ".../components/<group>/Foo.json", return "<group>".
@@ -315,13 +523,28 @@ def _component_group_for_abs_path(abs_path: Path) -> Optional[str]:
     return group if group in _OPENAPI_COMPONENT_KEYS else None
 
 
+class _SanitizeTable(dict):
+    """str.translate table mapping every character outside [A-Za-z0-9_] to "_"."""
+
+    def __missing__(self, codepoint: int) -> str:
+        # Only reached for non-ASCII characters; the ASCII range is filled in up front.
+        return "_"
+
+
+_SANITIZE_TABLE = _SanitizeTable(
+    (c, c if (chr(c).isascii() and chr(c).isalnum()) or chr(c) == "_" else "_") for c in range(128)
+)
+
+
+@lru_cache(maxsize=4096)
 def _sanitize_component_name(name: str) -> str:
     # Component keys are fairly permissive, but keep names conservative to avoid tool quirks.
-    name = re.sub(r"[^A-Za-z0-9_]+", "_", name)
-    name = re.sub(r"_+", "_", name).strip("_")
+    # Splitting on "_" and dropping empty parts collapses runs and strips the ends in one go.
+    name = "_".join(part for part in name.translate(_SANITIZE_TABLE).split("_") if part)
     return name or "Ref"
 
 
+@lru_cache(maxsize=4096)
 def _make_component_base_name(abs_path: Path, pointer: str) -> str:
     stem = abs_path.stem
     if pointer in ("", None):
@@ -348,18 +571,33 @@ class RefBundler:
         inline_internal_refs: bool = False,
         on_cycle: str = "keep",
         max_depth: int = 200,
+        documents: Optional[DocumentCache] = None,
     ) -> None:
         self.inline_internal_refs = inline_internal_refs
         self.on_cycle = on_cycle
         self.max_depth = max_depth
-        self._doc_cache: dict[str, Json] = {}
+        self._documents = documents if documents is not None else DocumentCache()
         self._cycle_warnings_emitted: set[tuple[str, str]] = set()
 
         # RefKey -> (component_group, component_name)
         self._ref_map: dict[RefKey, tuple[str, str]] = {}
         self._in_progress: set[RefKey] = set()
+        # Non-component refs currently being dereferenced at a usage site (the DFS path).
+        self._open_derefs: set[RefKey] = set()
         self._bundled_components: dict[str, dict[str, Any]] = {}
         self._reserved_component_names: dict[str, set[str]] = {}
+        self._traverse_cache: TraverseCache = {}
+        self._cycle_cuts = 0
+
+        # Used for internal refs when inline_internal_refs is set; shares our documents and
+        # warnings so files are loaded once and each cycle warning is printed once.
+        self._internal_inliner = RefInliner(
+            inline_internal_refs=True,
+            on_cycle=on_cycle,
+            max_depth=max_depth,
+            documents=self._documents,
+        )
+        self._internal_inliner._cycle_warnings_emitted = self._cycle_warnings_emitted
 
     def reserve_existing_components(self, doc: Json) -> None:
         """
@@ -378,12 +616,6 @@ class RefBundler:
             if isinstance(group_obj, dict):
                 self._reserved_component_names.setdefault(group, set()).update(group_obj.keys())
 
-    def _load_cached(self, abs_path: Path) -> Json:
-        key = str(abs_path)
-        if key not in self._doc_cache:
-            self._doc_cache[key] = _load_document(abs_path)
-        return self._doc_cache[key]
-
     def resolve_ref(self, ref_value: str, *, base_file: Path) -> tuple[Json, Path]:
         """
         Resolve a $ref to its target node without recursively bundling the target's
@@ -393,55 +625,53 @@ class RefBundler:
         file that should be used as the base for resolving *relative-file* $refs
         inside resolved_node.
         """
-        path_part, frag = _split_ref(ref_value)
+        target, abs_path = self._resolve_target(ref_value, base_file=base_file)
+        return _json_clone(target), abs_path
 
-        if path_part == "":
-            loaded = self._load_cached(base_file.resolve())
-            target = _json_pointer_get(loaded, frag, context=f"$ref '{ref_value}' from {base_file}")
-            return deepcopy(target), base_file.resolve()
+    def _resolve_target(self, ref_value: str, *, base_file: Path) -> tuple[Json, Path]:
+        """
+        Like resolve_ref, but returns the node inside the cached document itself.
 
-        abs_path = (base_file.parent / path_part).resolve()
-        loaded = self._load_cached(abs_path)
-        target = _json_pointer_get(loaded, frag, context=f"$ref '{ref_value}' from {base_file}")
-        return deepcopy(target), abs_path
+        _bundle_node never mutates its input, and walking the shared node lets every
+        usage-site dereference of the same target hit the traverse cache, so each
+        target is bundled once no matter how many refs point at it.
+        """
+        path_part, frag = _split_ref(ref_value)
+        abs_path = _resolve_ref_path(base_file, path_part)
+        return self._documents.resolve(abs_path, frag, ref_value=ref_value, base_file=base_file), abs_path
 
     def _internal_ref_for(self, group: str, name: str) -> str:
         return f"#/components/{group}/{name}"
 
-    def _bundle_component_ref(
+    def _enter_component_ref(
         self,
         ref_value: str,
         *,
         base_file: Path,
-        stack: list[RefKey],
         depth: int,
-    ) -> str:
-        path_part, frag = _split_ref(ref_value)
-        abs_path = (base_file.parent / path_part).resolve()
-        group = _component_group_for_abs_path(abs_path)
-        if group is None:
-            raise RuntimeError(f"Internal error: attempted to bundle non-component ref: {ref_value!r} from {base_file}")
+    ) -> tuple[str, Optional[tuple[RefKey, str, Json, Path]]]:
+        """
+        Assign (or look up) the component name for a component $ref.
 
-        key = RefKey(str(abs_path), frag)
+        Returns the $ref string to emit, plus (key, name, target, target_base_file) when
+        the definition still has to be bundled; the caller bundles it and then calls
+        _finish_component_ref.
 
-        if key in self._ref_map:
-            g, n = self._ref_map[key]
-            return self._internal_ref_for(g, n)
+        A key is recorded in _ref_map before its definition is walked, so a cyclic
+        ref back to it (or any later ref) just reuses the assigned name.
+        """
+        path_part, frag = _split_ref(ref_value)
+        abs_path = _resolve_ref_path(base_file, path_part)
+        key = _refkey(str(abs_path), frag)
 
-        # Break recursion while a definition is being computed.
-        if key in self._in_progress:
-            g, n = self._ref_map.get(key, (group, _make_component_base_name(abs_path, frag)))
-            return self._internal_ref_for(g, n)
+        # Already named (bundled, in progress, or cyclic): nothing else to derive.
+        mapped = self._ref_map.get(key)
+        if mapped is not None:
+            return self._internal_ref_for(*mapped), None
 
-        if key in stack:
-            msg = f"Cycle detected while resolving $ref '{ref_value}' from {base_file}."
-            if self.on_cycle == "keep":
-                warn_key = (str(base_file.resolve()), ref_value)
-                if warn_key not in self._cycle_warnings_emitted:
-                    self._cycle_warnings_emitted.add(warn_key)
-                    _eprint(f"warning: {msg} Keeping original $ref.")
-                return ref_value
-            raise RuntimeError(msg)
+        group = _component_group_for_abs_path(abs_path)
+        if group is None:
+            raise RuntimeError(f"Internal error: attempted to bundle non-component ref: {ref_value!r} from {base_file}")
 
         if depth > self.max_depth:
             raise RuntimeError(
@@ -462,14 +692,46 @@ class RefBundler:
         self._ref_map[key] = (group, name)
         self._in_progress.add(key)
 
-        loaded = self._load_cached(abs_path)
         try:
-            target = _json_pointer_get(loaded, frag, context=f"$ref '{ref_value}' from {base_file}")
+            target = self._documents.resolve(abs_path, frag, ref_value=ref_value, base_file=base_file)
         except Exception as e:
             raise RuntimeError(f"Failed to resolve $ref '{ref_value}' from {base_file}: {e}") from e
 
-        bundled = self._bundle_node(deepcopy(target), base_file=abs_path, stack=stack + [key], depth=depth + 1)
+        return self._internal_ref_for(group, name), (key, name, target, abs_path)
+
+    def _enter_deref(self, ref_value: str, *, base_file: Path, depth: int) -> Optional[RefKey]:
+        """
+        Check a non-component relative-file $ref for cycles/depth before it is
+        dereferenced at its usage site.
+
+        Returns the key to release with an _EXIT frame once the target is bundled, or
+        None when the ref is part of a cycle and on_cycle="keep" keeps it as-is.
+        """
+        path_part, frag = _split_ref(ref_value)
+        key = _refkey(str(_resolve_ref_path(base_file, path_part)), frag)
+
+        if key in self._open_derefs:
+            msg = f"Cycle detected while resolving $ref '{ref_value}' from {base_file}."
+            if self.on_cycle == "keep":
+                self._cycle_cuts += 1
+                warn_key = (str(_resolve_ref_path(base_file, "")), ref_value)
+                if warn_key not in self._cycle_warnings_emitted:
+                    self._cycle_warnings_emitted.add(warn_key)
+                    _eprint(f"warning: {msg} Keeping original $ref.")
+                return None
+            raise RuntimeError(msg)
+
+        if depth > self.max_depth:
+            raise RuntimeError(
+                f"Max depth exceeded ({self.max_depth}) while resolving $ref '{ref_value}' from {base_file}."
+            )
 
+        self._open_derefs.add(key)
+        return key
+
+    def _finish_component_ref(self, key: RefKey, name: str, bundled: Json, *, ref_value: str, base_file: Path) -> None:
+        group, _ = self._ref_map[key]
+        group_map = self._bundled_components[group]
         if name in group_map and group_map[name] != bundled:
             # Extremely unlikely due to hash suffix, but avoid silently clobbering.
             raise RuntimeError(
@@ -477,115 +739,162 @@ class RefBundler:
             )
         group_map[name] = bundled
         self._in_progress.remove(key)
-        return self._internal_ref_for(group, name)
 
-    def _bundle_node(self, node: Json, *, base_file: Path, stack: list[RefKey], depth: int) -> Json:
-        if isinstance(node, dict):
-            if "$ref" in node and isinstance(node.get("$ref"), str):
-                ref_value = node["$ref"]
-
-                if ref_value.startswith("#") and self.inline_internal_refs:
-                    # Inline within the current document, then keep bundling within the result.
-                    inliner = RefInliner(
-                        inline_internal_refs=True,
-                        on_cycle=self.on_cycle,
-                        max_depth=self.max_depth,
+    def _bundle_node(self, node: Json, *, base_file: Path, depth: int) -> Json:
+        """
+        Return a copy of node with relative-file $refs bundled (see _inline_node for
+        how the iterative walk is driven).
+        """
+        root: list[Json] = [None]
+        work: list[tuple[Any, ...]] = [(_VISIT, node, base_file, depth, root, 0)]
+        memo = self._traverse_cache
+        ref_free = self._documents.ref_free
+        while work:
+            frame = work.pop()
+            op = frame[0]
+
+            if op == _MEMO:
+                _, memo_key, source, cycle_cuts, parent, slot = frame
+                if self._cycle_cuts == cycle_cuts:
+                    memo[memo_key] = (source, parent[slot])
+                continue
+
+            if op == _EXIT:
+                self._open_derefs.discard(frame[1])
+                continue
+
+            if op == _COMPONENT:
+                _, key, name, bundled_holder, ref_value, ref_base_file = frame
+                self._finish_component_ref(key, name, bundled_holder[0], ref_value=ref_value, base_file=ref_base_file)
+                continue
+
+            if op == _ALLOF:
+                _, internal_ref, siblings_holder, parent, slot = frame
+                siblings_bundled = siblings_holder[0]
+                if not isinstance(siblings_bundled, dict):
+                    raise RuntimeError("Internal error: schema siblings should bundle to an object.")
+                parent[slot] = {"allOf": [{"$ref": internal_ref}, siblings_bundled]}
+                continue
+
+            if op == _MERGE:
+                _, resolved_holder, siblings_holder, parent, slot = frame
+                resolved_bundled, siblings_bundled = resolved_holder[0], siblings_holder[0]
+                if isinstance(resolved_bundled, dict) and isinstance(siblings_bundled, dict):
+                    parent[slot] = _deep_merge(resolved_bundled, siblings_bundled)
+                else:
+                    parent[slot] = siblings_bundled
+                continue
+
+            _, node, base_file, depth, parent, slot = frame
+            if not isinstance(node, (dict, list)) or id(node) in ref_free:
+                parent[slot] = node
+                continue
+            memo_key = (id(node), str(base_file))
+            hit = memo.get(memo_key)
+            if hit is not None and hit[0] is node:
+                parent[slot] = hit[1]
+                continue
+            work.append((_MEMO, memo_key, node, self._cycle_cuts, parent, slot))
+
+            if isinstance(node, list):
+                out_list: list[Json] = [None] * len(node)
+                parent[slot] = out_list
+                for i in range(len(node) - 1, -1, -1):
+                    work.append((_VISIT, node[i], base_file, depth + 1, out_list, i))
+                continue
+
+            ref_value = node.get("$ref")
+            if isinstance(ref_value, str) and ref_value.startswith("#") and self.inline_internal_refs:
+                # Inline within the current document, then keep bundling within the result.
+                inliner = self._internal_inliner
+                inliner_cycle_cuts = inliner._cycle_cuts
+                resolved = inliner._inline_ref_value(ref_value, base_file=base_file, depth=depth)
+                self._cycle_cuts += inliner._cycle_cuts - inliner_cycle_cuts
+                work.append((_VISIT, resolved, base_file, depth + 1, parent, slot))
+                continue
+
+            if isinstance(ref_value, str) and _is_relative_file_ref(ref_value):
+                path_part, _frag = _split_ref(ref_value)
+                abs_path = _resolve_ref_path(base_file, path_part)
+                group = _component_group_for_abs_path(abs_path)
+                siblings = {k: v for k, v in node.items() if k != "$ref"} if len(node) > 1 else None
+                # Frames are pushed in reverse: the component definition is bundled first,
+                # then the siblings / usage-site copy, then the result is assembled.
+                deferred: list[tuple[Any, ...]] = []
+
+                if group is not None:
+                    internal_ref, pending = self._enter_component_ref(
+                        ref_value, base_file=base_file, depth=depth
                     )
-                    inliner._doc_cache = self._doc_cache
-                    resolved = inliner._inline_ref_value(ref_value, base_file=base_file, stack=[], depth=depth)
-                    return self._bundle_node(resolved, base_file=base_file, stack=stack, depth=depth + 1)
-
-                if _is_relative_file_ref(ref_value):
-                    path_part, _frag = _split_ref(ref_value)
-                    abs_path = (base_file.parent / path_part).resolve()
-                    group = _component_group_for_abs_path(abs_path)
-                    siblings = {k: v for k, v in node.items() if k != "$ref"}
-
-                    if group is not None:
-                        internal_ref = self._bundle_component_ref(
-                            ref_value, base_file=base_file, stack=stack, depth=depth
-                        )
-                        if not siblings:
-                            return {"$ref": internal_ref}
+                    if pending is not None:
+                        key, name, target, target_base_file = pending
+                        bundled_holder: list[Json] = [None]
+                        deferred.append((_VISIT, target, target_base_file, depth + 1, bundled_holder, 0))
+                        deferred.append((_COMPONENT, key, name, bundled_holder, ref_value, base_file))
 
+                    if not siblings:
+                        parent[slot] = {"$ref": internal_ref}
+                    elif group == "schemas":
                         # Avoid emitting sibling keys next to $ref in Schema Objects.
-                        if group == "schemas":
-                            siblings_bundled = self._bundle_node(
-                                siblings, base_file=base_file, stack=stack, depth=depth + 1
-                            )
-                            if not isinstance(siblings_bundled, dict):
-                                raise RuntimeError("Internal error: schema siblings should bundle to an object.")
-                            return {"allOf": [{"$ref": internal_ref}, siblings_bundled]}
-
+                        siblings_holder: list[Json] = [None]
+                        deferred.append((_VISIT, siblings, base_file, depth + 1, siblings_holder, 0))
+                        deferred.append((_ALLOF, internal_ref, siblings_holder, parent, slot))
+                    else:
                         # Non-schema component refs with siblings: preserve old behavior by inlining at usage site.
-                        resolved, resolved_base_file = self.resolve_ref(ref_value, base_file=base_file)
-                        resolved_bundled = self._bundle_node(
-                            resolved, base_file=resolved_base_file, stack=stack, depth=depth + 1
-                        )
-                        siblings_bundled = self._bundle_node(
-                            siblings, base_file=base_file, stack=stack, depth=depth + 1
-                        )
-                        if isinstance(resolved_bundled, dict) and isinstance(siblings_bundled, dict):
-                            return _deep_merge(resolved_bundled, siblings_bundled)
-                        return siblings_bundled
-
+                        resolved, resolved_base_file = self._resolve_target(ref_value, base_file=base_file)
+                        resolved_holder: list[Json] = [None]
+                        siblings_holder = [None]
+                        deferred.append((_VISIT, resolved, resolved_base_file, depth + 1, resolved_holder, 0))
+                        deferred.append((_VISIT, siblings, base_file, depth + 1, siblings_holder, 0))
+                        deferred.append((_MERGE, resolved_holder, siblings_holder, parent, slot))
+                else:
                     # Non-component relative-file ref (e.g. paths/*.json). Dereference at usage site.
-                    resolved, resolved_base_file = self.resolve_ref(ref_value, base_file=base_file)
-                    resolved_bundled = self._bundle_node(
-                        resolved, base_file=resolved_base_file, stack=stack, depth=depth + 1
-                    )
+                    deref_key = self._enter_deref(ref_value, base_file=base_file, depth=depth)
+                    if deref_key is None:
+                        resolved = {"$ref": ref_value}
+                        resolved_base_file = base_file
+                    else:
+                        resolved, resolved_base_file = self._resolve_target(ref_value, base_file=base_file)
                     if not siblings:
-                        return resolved_bundled
-                    siblings_bundled = self._bundle_node(siblings, base_file=base_file, stack=stack, depth=depth + 1)
-                    if isinstance(resolved_bundled, dict) and isinstance(siblings_bundled, dict):
-                        return _deep_merge(resolved_bundled, siblings_bundled)
-                    return siblings_bundled
-
-                # Non-relative refs are left intact, but we still bundle inside siblings (if any).
-                out: dict[str, Any] = {}
-                for k, v in node.items():
-                    if k == "$ref":
-                        out[k] = v
+                        if deref_key is None:
+                            parent[slot] = resolved
+                        else:
+                            deferred.append((_VISIT, resolved, resolved_base_file, depth + 1, parent, slot))
+                            deferred.append((_EXIT, deref_key))
                     else:
-                        out[k] = self._bundle_node(v, base_file=base_file, stack=stack, depth=depth + 1)
-                return out
-
-            return {
-                k: self._bundle_node(v, base_file=base_file, stack=stack, depth=depth + 1) for k, v in node.items()
-            }
+                        resolved_holder = [None]
+                        siblings_holder = [None]
+                        if deref_key is None:
+                            resolved_holder[0] = resolved
+                        else:
+                            deferred.append((_VISIT, resolved, resolved_base_file, depth + 1, resolved_holder, 0))
+                            deferred.append((_EXIT, deref_key))
+                        deferred.append((_VISIT, siblings, base_file, depth + 1, siblings_holder, 0))
+                        deferred.append((_MERGE, resolved_holder, siblings_holder, parent, slot))
+
+                work.extend(reversed(deferred))
+                continue
 
-        if isinstance(node, list):
-            return [self._bundle_node(v, base_file=base_file, stack=stack, depth=depth + 1) for v in node]
+            # Regular dict (or a non-relative ref we leave intact): copy keys in order, bundling every value.
+            out: dict[str, Any] = dict.fromkeys(node)
+            parent[slot] = out
+            for k, v in reversed(node.items()):
+                work.append((_VISIT, v, base_file, depth + 1, out, k))
 
-        return node
+        return root[0]
 
     def bundle(self, entrypoint: Path) -> Json:
         entry_abs = entrypoint.resolve()
-        doc = self._load_cached(entry_abs)
+        doc = self._documents.load(entry_abs)
         self.reserve_existing_components(doc)
-        out = self._bundle_node(deepcopy(doc), base_file=entry_abs, stack=[], depth=0)
+        self._traverse_cache.clear()
+        out = self._bundle_node(doc, base_file=entry_abs, depth=0)
         if not isinstance(out, dict):
             return out
 
         if self._bundled_components:
-            components = out.get("components")
-            if components is None:
-                components = {}
-                out["components"] = components
-            if not isinstance(components, dict):
-                raise RuntimeError("Top-level 'components' exists but is not an object; cannot bundle components.")
-
-            for group, defs in self._bundled_components.items():
-                group_obj = components.get(group)
-                if group_obj is None:
-                    components[group] = dict(defs)
-                else:
-                    if not isinstance(group_obj, dict):
-                        raise RuntimeError(f"components.{group} exists but is not an object; cannot merge bundled defs.")
-                    for name, val in defs.items():
-                        if name in group_obj and group_obj[name] != val:
-                            raise RuntimeError(f"Bundled component {group}/{name} conflicts with existing definition.")
-                        group_obj[name] = val
+            # May be a ref-free subtree of the cached entrypoint; the merge copies it.
+            out["components"] = _merge_bundled_components(out.get("components"), self._bundled_components)
         return out
 
 
@@ -680,11 +989,13 @@ _OPENAPI_METHOD_KEYS: set[str] = {
 }
 
 
+@lru_cache(maxsize=4096)
 def _parse_endpoint_spec(spec: str) -> tuple[str, str]:
     parts = spec.strip().split(None, 1)
     if len(parts) != 2:
         raise ValueError(f'Invalid --endpoint value {spec!r}. Expected format: "METHOD /path".')
-    method = parts[0].strip().lower()
+    # Interned so comparisons against the (compiler-interned) method-name literals hit on identity.
+    method = sys.intern(parts[0].strip().lower())
     path = parts[1].strip()
     if method not in _OPENAPI_METHOD_KEYS:
         raise ValueError(f"Invalid HTTP method {parts[0]!r} in --endpoint {spec!r}.")
@@ -701,31 +1012,42 @@ def _selective_megaspec(entry_doc: Json, *, entry_file: Path, inliner: RefInline
     if not isinstance(paths_obj, dict):
         raise RuntimeError("Entrypoint document must have a top-level 'paths' object for selective endpoint mode.")
 
-    # Preserve everything except 'paths', which we rebuild.
-    out: dict[str, Any] = {k: deepcopy(v) for k, v in entry_doc.items() if k != "paths"}
+    # Preserve everything except 'paths', which we rebuild. The preserved values are shared
+    # with the cached entrypoint; nothing below writes into them.
+    out: dict[str, Any] = {k: v for k, v in entry_doc.items() if k != "paths"}
     out_paths: dict[str, Any] = {}
 
+    # Path items resolved so far, so several methods on one path follow its $ref once.
+    path_items: dict[str, tuple[dict[str, Any], Path]] = {}
+
     for spec in endpoints:
         method, path = _parse_endpoint_spec(spec)
         if path not in paths_obj:
             raise RuntimeError(f"Path {path!r} not found in entrypoint 'paths'.")
 
-        path_entry = paths_obj[path]
-        path_base_file = entry_file.resolve()
+        if path in path_items:
+            path_entry, path_base_file = path_items[path]
+        else:
+            path_entry = paths_obj[path]
+            path_base_file = entry_file.resolve()
 
-        # Common OpenAPI pattern: paths: { "/x": { "$ref": "paths/x.json" } }
-        if isinstance(path_entry, dict) and isinstance(path_entry.get("$ref"), str):
-            ref_value = path_entry["$ref"]
-            if _looks_like_url(ref_value):
-                raise RuntimeError(f"URL $ref not supported for selective endpoint mode: {ref_value!r}")
-            path_entry, path_base_file = inliner.resolve_ref(ref_value, base_file=entry_file)
+            # Common OpenAPI pattern: paths: { "/x": { "$ref": "paths/x.json" } }
+            if isinstance(path_entry, dict) and isinstance(path_entry.get("$ref"), str):
+                ref_value = path_entry["$ref"]
+                if _looks_like_url(ref_value):
+                    raise RuntimeError(f"URL $ref not supported for selective endpoint mode: {ref_value!r}")
+                path_entry, path_base_file = inliner._resolve_target(ref_value, base_file=entry_file)
 
-        if not isinstance(path_entry, dict):
-            raise RuntimeError(f"Path item for {path!r} must be an object (got {type(path_entry).__name__}).")
+            if not isinstance(path_entry, dict):
+                raise RuntimeError(f"Path item for {path!r} must be an object (got {type(path_entry).__name__}).")
+            path_items[path] = (path_entry, path_base_file)
 
         op_obj = path_entry.get(method)
         if not isinstance(op_obj, dict):
             raise RuntimeError(f"Method {method.upper()} not found for path {path!r}.")
+        if method in out_paths.get(path, ()):
+            # Same endpoint listed twice; it is already in the output.
+            continue
 
         # Initialize path item in output, preserving pathItem-level keys like 'parameters'.
         existing = out_paths.get(path)
@@ -734,20 +1056,48 @@ def _selective_megaspec(entry_doc: Json, *, entry_file: Path, inliner: RefInline
             for k, v in path_entry.items():
                 if k in _OPENAPI_METHOD_KEYS:
                     continue
-                path_item_out[k] = inliner._inline_node(deepcopy(v), base_file=path_base_file, stack=[], depth=0)
+                path_item_out[k] = inliner._inline_node(v, base_file=path_base_file, depth=0)
             out_paths[path] = path_item_out
         else:
             if not isinstance(existing, dict):
                 raise RuntimeError(f"Internal error: output path item for {path!r} is not an object.")
 
         # Inline all relative refs inside the operation.
-        out_op = inliner._inline_node(deepcopy(op_obj), base_file=path_base_file, stack=[], depth=0)
+        out_op = inliner._inline_node(op_obj, base_file=path_base_file, depth=0)
         out_paths[path][method] = out_op
 
     out["paths"] = out_paths
     return out
 
 
+def _merge_bundled_components(components: Any, bundled: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    """
+    Return a copy of a document's components with bundled defs merged into their groups.
+
+    components (None if the document has none) and its groups are never written to.
+    """
+    if components is None:
+        components = {}
+    if not isinstance(components, dict):
+        raise RuntimeError("Top-level 'components' exists but is not an object; cannot bundle components.")
+
+    merged = dict(components)
+    for group, defs in bundled.items():
+        group_obj = merged.get(group)
+        if group_obj is None:
+            merged[group] = dict(defs)
+            continue
+        if not isinstance(group_obj, dict):
+            raise RuntimeError(f"components.{group} exists but is not an object; cannot merge bundled defs.")
+        for name, val in defs.items():
+            existing = group_obj.get(name, val)
+            # A def already present is usually the same object, so skip the deep compare.
+            if existing is not val and existing != val:
+                raise RuntimeError(f"Bundled component {group}/{name} conflicts with existing definition.")
+        merged[group] = {**group_obj, **defs}
+    return merged
+
+
 def _selective_megaspec_bundle(entry_doc: Json, *, entry_file: Path, bundler: RefBundler, endpoints: list[str]) -> Json:
     if not isinstance(entry_doc, dict):
         raise RuntimeError("Entrypoint document must be an object at the top-level for selective endpoint mode.")
@@ -759,30 +1109,41 @@ def _selective_megaspec_bundle(entry_doc: Json, *, entry_file: Path, bundler: Re
         raise RuntimeError("Entrypoint document must have a top-level 'paths' object for selective endpoint mode.")
 
     # Preserve everything except 'paths', which we rebuild. Preserve 'components' too; we will merge bundled defs in.
-    out: dict[str, Any] = {k: deepcopy(v) for k, v in entry_doc.items() if k != "paths"}
+    # The preserved values are shared with the cached entrypoint, so the merge below copies before writing.
+    out: dict[str, Any] = {k: v for k, v in entry_doc.items() if k != "paths"}
     out_paths: dict[str, Any] = {}
 
+    # Path items resolved so far, so several methods on one path follow its $ref once.
+    path_items: dict[str, tuple[dict[str, Any], Path]] = {}
+
     for spec in endpoints:
         method, path = _parse_endpoint_spec(spec)
         if path not in paths_obj:
             raise RuntimeError(f"Path {path!r} not found in entrypoint 'paths'.")
 
-        path_entry = paths_obj[path]
-        path_base_file = entry_file.resolve()
+        if path in path_items:
+            path_entry, path_base_file = path_items[path]
+        else:
+            path_entry = paths_obj[path]
+            path_base_file = entry_file.resolve()
 
-        # Common OpenAPI pattern: paths: { "/x": { "$ref": "paths/x.json" } }
-        if isinstance(path_entry, dict) and isinstance(path_entry.get("$ref"), str):
-            ref_value = path_entry["$ref"]
-            if _looks_like_url(ref_value):
-                raise RuntimeError(f"URL $ref not supported for selective endpoint mode: {ref_value!r}")
-            path_entry, path_base_file = bundler.resolve_ref(ref_value, base_file=entry_file)
+            # Common OpenAPI pattern: paths: { "/x": { "$ref": "paths/x.json" } }
+            if isinstance(path_entry, dict) and isinstance(path_entry.get("$ref"), str):
+                ref_value = path_entry["$ref"]
+                if _looks_like_url(ref_value):
+                    raise RuntimeError(f"URL $ref not supported for selective endpoint mode: {ref_value!r}")
+                path_entry, path_base_file = bundler._resolve_target(ref_value, base_file=entry_file)
 
-        if not isinstance(path_entry, dict):
-            raise RuntimeError(f"Path item for {path!r} must be an object (got {type(path_entry).__name__}).")
+            if not isinstance(path_entry, dict):
+                raise RuntimeError(f"Path item for {path!r} must be an object (got {type(path_entry).__name__}).")
+            path_items[path] = (path_entry, path_base_file)
 
         op_obj = path_entry.get(method)
         if not isinstance(op_obj, dict):
             raise RuntimeError(f"Method {method.upper()} not found for path {path!r}.")
+        if method in out_paths.get(path, ()):
+            # Same endpoint listed twice; it is already in the output.
+            continue
 
         # Initialize path item in output, preserving pathItem-level keys like 'parameters'.
         existing = out_paths.get(path)
@@ -791,36 +1152,21 @@ def _selective_megaspec_bundle(entry_doc: Json, *, entry_file: Path, bundler: Re
             for k, v in path_entry.items():
                 if k in _OPENAPI_METHOD_KEYS:
                     continue
-                path_item_out[k] = bundler._bundle_node(deepcopy(v), base_file=path_base_file, stack=[], depth=0)
+                path_item_out[k] = bundler._bundle_node(v, base_file=path_base_file, depth=0)
             out_paths[path] = path_item_out
         else:
             if not isinstance(existing, dict):
                 raise RuntimeError(f"Internal error: output path item for {path!r} is not an object.")
 
-        out_op = bundler._bundle_node(deepcopy(op_obj), base_file=path_base_file, stack=[], depth=0)
+        out_op = bundler._bundle_node(op_obj, base_file=path_base_file, depth=0)
         out_paths[path][method] = out_op
 
     out["paths"] = out_paths
 
     # Merge any bundled component definitions required by the selected endpoints.
     if bundler._bundled_components:
-        components = out.get("components")
-        if components is None:
-            components = {}
-            out["components"] = components
-        if not isinstance(components, dict):
-            raise RuntimeError("Top-level 'components' exists but is not an object; cannot bundle components.")
-        for group, defs in bundler._bundled_components.items():
-            group_obj = components.get(group)
-            if group_obj is None:
-                components[group] = dict(defs)
-            else:
-                if not isinstance(group_obj, dict):
-                    raise RuntimeError(f"components.{group} exists but is not an object; cannot merge bundled defs.")
-                for name, val in defs.items():
-                    if name in group_obj and group_obj[name] != val:
-                        raise RuntimeError(f"Bundled component {group}/{name} conflicts with existing definition.")
-                    group_obj[name] = val
+        # components and its groups still belong to the cached entrypoint; the merge copies them.
+        out["components"] = _merge_bundled_components(out.get("components"), bundler._bundled_components)
 
     return out
 
@@ -830,18 +1176,28 @@ def _strip_x_properties(node: Json, *, keep_keys: set[str] | None = None) -> Jso
     Remove vendor-extension keys (OpenAPI-style) from all objects.
     Any object property whose key starts with 'x-' is removed recursively.
     """
-    if isinstance(node, list):
-        return [_strip_x_properties(v, keep_keys=keep_keys) for v in node]
-    if isinstance(node, dict):
-        out: dict[str, Any] = {}
-        for k, v in node.items():
-            if isinstance(k, str) and k.startswith("x-"):
-                if keep_keys and k in keep_keys:
-                    out[k] = _strip_x_properties(v, keep_keys=keep_keys)
-                continue
-            out[k] = _strip_x_properties(v, keep_keys=keep_keys)
-        return out
-    return node
+    keep = keep_keys or set()
+    # Always returns fresh containers: this is the pass that gives the caller a tree it may
+    # mutate, since the bundler/inliner output shares subtrees with each other and the cache.
+    root: list[Json] = [None]
+    work: list[tuple[Json, Any, Any]] = [(node, root, 0)]
+    while work:
+        current, parent, slot = work.pop()
+        if isinstance(current, list):
+            out_list: list[Json] = [None] * len(current)
+            parent[slot] = out_list
+            work.extend((v, out_list, i) for i, v in enumerate(current))
+        elif isinstance(current, dict):
+            out: dict[str, Any] = {}
+            for k, v in current.items():
+                if isinstance(k, str) and k.startswith("x-") and k not in keep:
+                    continue
+                out[k] = None
+                work.append((v, out, k))
+            parent[slot] = out
+        else:
+            parent[slot] = current
+    return root[0]
 
 
 def _load_manifest(path: Path) -> dict[str, Any]:
@@ -916,6 +1272,13 @@ def _get_manifest_types(manifest: dict[str, Any]) -> tuple[set[str], set[str]]:
     )
 
 
+@lru_cache(maxsize=2048)
+def _split_dotted(text: str) -> tuple[str, ...]:
+    # Non-empty segments of a dotted manifest key or field path ("Type.prop.sub").
+    # Cached because allow and deny sections often repeat the same owners.
+    return tuple(p for p in text.split(".") if p)
+
+
 def _parse_field_map(value: Any, *, label: str) -> dict[str, list[list[str]]]:
     if value is None:
         return {}
@@ -931,7 +1294,7 @@ def _parse_field_map(value: Any, *, label: str) -> dict[str, list[list[str]]]:
         segs: list[list[str]] = []
         for p in paths:
             # Dot-path into object properties (e.g. "usage.total_tokens").
-            parts = [x for x in p.split(".") if x != ""]
+            parts = list(_split_dotted(p))
             if not parts:
                 continue
             segs.append(parts)
@@ -958,11 +1321,11 @@ def _parse_enum_map(value: Any, *, label: str) -> dict[str, list[tuple[Optional[
             raise RuntimeError(f"Manifest {label} keys must be strings (type names).")
         if not isinstance(values, list):
             raise RuntimeError(f"Manifest {label}.{owner} must be a list of strings.")
-        parts = [p for p in owner.split(".") if p != ""]
+        parts = _split_dotted(owner)
         if not parts:
             raise RuntimeError(f"Manifest {label} keys must be non-empty strings.")
         type_name = parts[0]
-        path = parts[1:] or None
+        path = list(parts[1:]) or None
         normalized = _normalize_string_list(values, label=f"{label}.{owner}")
         out.setdefault(type_name, []).append((path, normalized))
     return out
@@ -992,11 +1355,11 @@ def _parse_description_map(value: Any, *, label: str) -> dict[str, list[tuple[Op
             raise RuntimeError(f"Manifest {label} keys must be strings (type names).")
         if desc is not None and not isinstance(desc, str):
             raise RuntimeError(f"Manifest {label}.{owner} must be a string or null.")
-        parts = [p for p in owner.split(".") if p != ""]
+        parts = _split_dotted(owner)
         if not parts:
             raise RuntimeError(f"Manifest {label} keys must be non-empty strings.")
         type_name = parts[0]
-        path = parts[1:] or None
+        path = list(parts[1:]) or None
         out.setdefault(type_name, []).append((path, desc))
     return out
 
@@ -1034,7 +1397,7 @@ def _parse_oneof_map(
         if owner.startswith("paths."):
             # paths.METHOD /path.responses.200.content.text/event-stream.schema
             rest = owner[len("paths.") :]
-            parts = [p for p in rest.split(".") if p != ""]
+            parts = _split_dotted(rest)
             if len(parts) < 2:
                 raise RuntimeError(f"Manifest {label} path rules must include a target path: {owner!r}.")
             method_path = parts[0]
@@ -1043,17 +1406,17 @@ def _parse_oneof_map(
                 (
                     method,
                     path,
-                    parts[1:],
+                    list(parts[1:]),
                     set(_normalize_string_list(targets, label=f"{label}.{owner}")),
                 )
             )
             continue
 
-        parts = [p for p in owner.split(".") if p != ""]
+        parts = _split_dotted(owner)
         if not parts:
             raise RuntimeError(f"Manifest {label} keys must be non-empty strings.")
         type_name = parts[0]
-        path = parts[1:] or None
+        path = list(parts[1:]) or None
         out.setdefault(type_name, []).append((path, set(_normalize_string_list(targets, label=f"{label}.{owner}"))))
     return out, path_rules
 
@@ -1072,79 +1435,121 @@ def _get_manifest_oneof(
     return allow_oneof, deny_oneof, allow_path_rules, deny_path_rules
 
 
-def _node_contains_ref_to_type(node: Json, *, type_name: str) -> bool:
-    ref = f"#/components/schemas/{type_name}"
-    if isinstance(node, dict):
-        if node.get("$ref") == ref:
-            return True
-        for v in node.values():
-            if _node_contains_ref_to_type(v, type_name=type_name):
-                return True
-    elif isinstance(node, list):
-        for v in node:
-            if _node_contains_ref_to_type(v, type_name=type_name):
-                return True
-    return False
+_SCHEMA_REF_PREFIX = "#/components/schemas/"
 
 
-def _oneof_item_matches_type(item: Json, *, type_name: str) -> bool:
-    return _node_contains_ref_to_type(item, type_name=type_name)
+def _schema_refs_in(node: Json, cache: dict[int, frozenset[str]]) -> frozenset[str]:
+    """
+    Names of every '#/components/schemas/<name>' $ref anywhere in node's subtree.
 
+    cache maps id(container) -> names for every container already visited, so nested
+    oneOf items reuse the sets computed for their ancestors instead of re-walking. It is
+    only valid while the walked tree is alive and unmodified (one _filter_oneof_tree call).
+    """
+    if not isinstance(node, (dict, list)):
+        return frozenset()
+    order: list[Json] = []
+    stack: list[Json] = [node]
+    while stack:
+        current = stack.pop()
+        if id(current) in cache:
+            continue
+        order.append(current)
+        children = current.values() if isinstance(current, dict) else current
+        stack.extend(child for child in children if isinstance(child, (dict, list)))
+
+    # Reversed pre-order visits every child before its parent.
+    for current in reversed(order):
+        names: set[str] = set()
+        if isinstance(current, dict):
+            ref = current.get("$ref")
+            if isinstance(ref, str) and ref.startswith(_SCHEMA_REF_PREFIX):
+                names.add(ref[len(_SCHEMA_REF_PREFIX) :])
+            children = current.values()
+        else:
+            children = current
+        for child in children:
+            if isinstance(child, (dict, list)):
+                names.update(cache[id(child)])
+        cache[id(current)] = frozenset(names)
+    return cache[id(node)]
 
-def _filter_oneof_lists(node: Json, *, remove_types: set[str]) -> Json:
-    if isinstance(node, list):
-        return [_filter_oneof_lists(v, remove_types=remove_types) for v in node]
-    if not isinstance(node, dict):
-        return node
 
-    out: dict[str, Any] = {}
-    for k, v in node.items():
-        if k == "oneOf" and isinstance(v, list):
-            filtered: list[Json] = []
-            for item in v:
-                if any(_oneof_item_matches_type(item, type_name=t) for t in remove_types):
-                    continue
-                filtered.append(_filter_oneof_lists(item, remove_types=remove_types))
-            out[k] = filtered
-            continue
-        out[k] = _filter_oneof_lists(v, remove_types=remove_types)
-    return out
+def _filter_oneof_tree(
+    node: Json,
+    *,
+    keep_item: Callable[[frozenset[str]], bool],
+    keep_subtree: Optional[Callable[[frozenset[str]], bool]] = None,
+) -> Json:
+    """
+    Copy node, dropping every oneOf item for which keep_item(<schema names it references>)
+    is false. Kept items are filtered the same way.
 
+    Containers for which keep_subtree(<schema names referenced below them>) is true cannot
+    lose any item and are reused as-is instead of copied (node itself included).
+    """
+    refs_cache: dict[int, frozenset[str]] = {}
+    root: list[Json] = [None]
+    work: list[tuple[Json, Any, Any]] = [(node, root, 0)]
+    while work:
+        current, parent, slot = work.pop()
+        if (
+            keep_subtree is not None
+            and isinstance(current, (dict, list))
+            and keep_subtree(_schema_refs_in(current, refs_cache))
+        ):
+            parent[slot] = current
+        elif isinstance(current, list):
+            out_list: list[Json] = [None] * len(current)
+            parent[slot] = out_list
+            work.extend((v, out_list, i) for i, v in enumerate(current))
+        elif isinstance(current, dict):
+            out: dict[str, Any] = {}
+            for k, v in current.items():
+                if k == "oneOf" and isinstance(v, list):
+                    kept = [item for item in v if keep_item(_schema_refs_in(item, refs_cache))]
+                    filtered: list[Json] = [None] * len(kept)
+                    out[k] = filtered
+                    work.extend((item, filtered, i) for i, item in enumerate(kept))
+                else:
+                    out[k] = None
+                    work.append((v, out, k))
+            parent[slot] = out
+        else:
+            parent[slot] = current
+    return root[0]
+
+
+def _filter_oneof_lists(node: Json, *, remove_types: set[str], reuse_subtrees: bool = True) -> Json:
+    # A subtree that references none of the removed types has no oneOf item to drop.
+    # Callers that store the result somewhere other than node's own slot pass
+    # reuse_subtrees=False so the result never aliases node.
+    return _filter_oneof_tree(
+        node,
+        keep_item=remove_types.isdisjoint,
+        keep_subtree=remove_types.isdisjoint if reuse_subtrees else None,
+    )
 
-def _filter_oneof_lists_allow(node: Json, *, keep_types: set[str]) -> Json:
-    if isinstance(node, list):
-        return [_filter_oneof_lists_allow(v, keep_types=keep_types) for v in node]
-    if not isinstance(node, dict):
-        return node
 
-    out: dict[str, Any] = {}
-    for k, v in node.items():
-        if k == "oneOf" and isinstance(v, list):
-            filtered: list[Json] = []
-            for item in v:
-                if not any(_oneof_item_matches_type(item, type_name=t) for t in keep_types):
-                    continue
-                filtered.append(_filter_oneof_lists_allow(item, keep_types=keep_types))
-            out[k] = filtered
-            continue
-        out[k] = _filter_oneof_lists_allow(v, keep_types=keep_types)
-    return out
+def _filter_oneof_lists_allow(node: Json, *, keep_types: set[str]) -> Json:
+    return _filter_oneof_tree(node, keep_item=lambda names: not keep_types.isdisjoint(names))
 
 
-def _apply_oneof_filter_to_subtree(
+def _apply_at_schema_path(
     schema_obj: Json,
     *,
     path: Optional[list[str]],
-    schemas: Optional[dict[str, Any]] = None,
-    keep_types: Optional[set[str]] = None,
-    remove_types: Optional[set[str]] = None,
+    schemas: Optional[dict[str, Any]],
+    apply: Callable[[Json], Json],
 ) -> Json:
+    """
+    Replace the schema at the given property path (None = schema_obj itself) with
+    apply(<schema>), following local '#/components/schemas/...' refs along the way.
+    Referenced schemas are updated in schemas; everything else in place. Returns the
+    (possibly replaced) schema_obj.
+    """
     if path is None:
-        if keep_types is not None:
-            return _filter_oneof_lists_allow(schema_obj, keep_types=keep_types)
-        if remove_types is not None:
-            return _filter_oneof_lists(schema_obj, remove_types=remove_types)
-        return schema_obj
+        return apply(schema_obj)
 
     if not isinstance(schema_obj, dict):
         return schema_obj
@@ -1159,57 +1564,52 @@ def _apply_oneof_filter_to_subtree(
         return schema_obj
 
     if isinstance(child, dict) and isinstance(child.get("$ref"), str) and schemas is not None:
-        ref_value = child.get("$ref")
-        path_part, frag = _split_ref(ref_value)
-        if path_part == "" and frag.startswith("/components/schemas/"):
-            toks = _decode_pointer_path(frag)
-            if len(toks) >= 3 and toks[0] == "components" and toks[1] == "schemas":
-                target_name = toks[2]
-                target_schema = schemas.get(target_name)
-                if isinstance(target_schema, dict):
-                    if len(path) == 1:
-                        if keep_types is not None:
-                            schemas[target_name] = _filter_oneof_lists_allow(target_schema, keep_types=keep_types)
-                        elif remove_types is not None:
-                            schemas[target_name] = _filter_oneof_lists(target_schema, remove_types=remove_types)
-                        return schema_obj
-
-                    schemas[target_name] = _apply_oneof_filter_to_subtree(
-                        target_schema,
-                        path=path[1:],
-                        schemas=schemas,
-                        keep_types=keep_types,
-                        remove_types=remove_types,
+        target_name = _local_schema_ref_name(child["$ref"])
+        if target_name is not None:
+            target_schema = schemas.get(target_name)
+            if isinstance(target_schema, dict):
+                if len(path) == 1:
+                    schemas[target_name] = apply(target_schema)
+                else:
+                    schemas[target_name] = _apply_at_schema_path(
+                        target_schema, path=path[1:], schemas=schemas, apply=apply
                     )
-                    return schema_obj
+                return schema_obj
 
     if len(path) == 1:
-        if keep_types is not None:
-            props[head] = _filter_oneof_lists_allow(child, keep_types=keep_types)
-        elif remove_types is not None:
-            props[head] = _filter_oneof_lists(child, remove_types=remove_types)
+        props[head] = apply(child)
         return schema_obj
 
     if isinstance(child, dict):
-        props[head] = _apply_oneof_filter_to_subtree(
-            child,
-            path=path[1:],
-            schemas=schemas,
-            keep_types=keep_types,
-            remove_types=remove_types,
-        )
+        props[head] = _apply_at_schema_path(child, path=path[1:], schemas=schemas, apply=apply)
     return schema_obj
 
 
+def _apply_oneof_filter_to_subtree(
+    schema_obj: Json,
+    *,
+    path: Optional[list[str]],
+    schemas: Optional[dict[str, Any]] = None,
+    keep_types: Optional[set[str]] = None,
+    remove_types: Optional[set[str]] = None,
+) -> Json:
+    def apply(node: Json) -> Json:
+        if keep_types is not None:
+            return _filter_oneof_lists_allow(node, keep_types=keep_types)
+        if remove_types is not None:
+            return _filter_oneof_lists(node, remove_types=remove_types)
+        return node
+
+    return _apply_at_schema_path(schema_obj, path=path, schemas=schemas, apply=apply)
+
+
 def _filter_enum_list(values: list[Any], *, allow_values: Optional[list[str]], deny_values: Optional[list[str]]) -> list[Any]:
-    out: list[Any] = list(values)
-    if allow_values is not None:
-        allow_set = set(allow_values)
-        out = [v for v in out if v in allow_set]
-    if deny_values is not None:
-        deny_set = set(deny_values)
-        out = [v for v in out if v not in deny_set]
-    return out
+    # One pass over values; an empty allow list still means "allow nothing", so test for None.
+    allow_set = set(allow_values) if allow_values is not None else None
+    deny_set = set(deny_values) if deny_values else None
+    return [
+        v for v in values if (allow_set is None or v in allow_set) and (deny_set is None or v not in deny_set)
+    ]
 
 
 def _apply_enum_filter_to_subtree(
@@ -1220,72 +1620,14 @@ def _apply_enum_filter_to_subtree(
     allow_values: Optional[list[str]] = None,
     deny_values: Optional[list[str]] = None,
 ) -> Json:
-    if not isinstance(schema_obj, dict):
-        return schema_obj
-
-    if path is None:
-        enum_values = schema_obj.get("enum")
-        if isinstance(enum_values, list):
-            schema_obj["enum"] = _filter_enum_list(
-                enum_values, allow_values=allow_values, deny_values=deny_values
-            )
-        return schema_obj
-
-    props = schema_obj.get("properties")
-    if not isinstance(props, dict):
-        return schema_obj
-
-    head = path[0]
-    child = props.get(head)
-    if child is None:
-        return schema_obj
-
-    if isinstance(child, dict) and isinstance(child.get("$ref"), str) and schemas is not None:
-        ref_value = child.get("$ref")
-        path_part, frag = _split_ref(ref_value)
-        if path_part == "" and frag.startswith("/components/schemas/"):
-            toks = _decode_pointer_path(frag)
-            if len(toks) >= 3 and toks[0] == "components" and toks[1] == "schemas":
-                target_name = toks[2]
-                target_schema = schemas.get(target_name)
-                if isinstance(target_schema, dict):
-                    if len(path) == 1:
-                        schemas[target_name] = _apply_enum_filter_to_subtree(
-                            target_schema,
-                            path=None,
-                            schemas=schemas,
-                            allow_values=allow_values,
-                            deny_values=deny_values,
-                        )
-                        return schema_obj
-
-                    schemas[target_name] = _apply_enum_filter_to_subtree(
-                        target_schema,
-                        path=path[1:],
-                        schemas=schemas,
-                        allow_values=allow_values,
-                        deny_values=deny_values,
-                    )
-                    return schema_obj
-
-    if len(path) == 1:
-        if isinstance(child, dict):
-            enum_values = child.get("enum")
+    def apply(node: Json) -> Json:
+        if isinstance(node, dict):
+            enum_values = node.get("enum")
             if isinstance(enum_values, list):
-                child["enum"] = _filter_enum_list(
-                    enum_values, allow_values=allow_values, deny_values=deny_values
-                )
-        return schema_obj
+                node["enum"] = _filter_enum_list(enum_values, allow_values=allow_values, deny_values=deny_values)
+        return node
 
-    if isinstance(child, dict):
-        props[head] = _apply_enum_filter_to_subtree(
-            child,
-            path=path[1:],
-            schemas=schemas,
-            allow_values=allow_values,
-            deny_values=deny_values,
-        )
-    return schema_obj
+    return _apply_at_schema_path(schema_obj, path=path, schemas=schemas, apply=apply)
 
 
 def _apply_description_override_to_subtree(
@@ -1295,81 +1637,44 @@ def _apply_description_override_to_subtree(
     schemas: Optional[dict[str, Any]] = None,
     description: Optional[str],
 ) -> Json:
-    if not isinstance(schema_obj, dict):
-        return schema_obj
-
-    if path is None:
-        if description is None:
-            schema_obj.pop("description", None)
-        else:
-            schema_obj["description"] = description
-        return schema_obj
-
-    props = schema_obj.get("properties")
-    if not isinstance(props, dict):
-        return schema_obj
-
-    head = path[0]
-    child = props.get(head)
-    if child is None:
-        return schema_obj
-
-    if isinstance(child, dict) and isinstance(child.get("$ref"), str) and schemas is not None:
-        ref_value = child.get("$ref")
-        path_part, frag = _split_ref(ref_value)
-        if path_part == "" and frag.startswith("/components/schemas/"):
-            toks = _decode_pointer_path(frag)
-            if len(toks) >= 3 and toks[0] == "components" and toks[1] == "schemas":
-                target_name = toks[2]
-                target_schema = schemas.get(target_name)
-                if isinstance(target_schema, dict):
-                    if len(path) == 1:
-                        schemas[target_name] = _apply_description_override_to_subtree(
-                            target_schema,
-                            path=None,
-                            schemas=schemas,
-                            description=description,
-                        )
-                        return schema_obj
-
-                    schemas[target_name] = _apply_description_override_to_subtree(
-                        target_schema,
-                        path=path[1:],
-                        schemas=schemas,
-                        description=description,
-                    )
-                    return schema_obj
-
-    if len(path) == 1:
-        if isinstance(child, dict):
+    def apply(node: Json) -> Json:
+        if isinstance(node, dict):
             if description is None:
-                child.pop("description", None)
+                node.pop("description", None)
             else:
-                child["description"] = description
-        return schema_obj
+                node["description"] = description
+        return node
 
-    if isinstance(child, dict):
-        props[head] = _apply_description_override_to_subtree(
-            child,
-            path=path[1:],
-            schemas=schemas,
-            description=description,
-        )
-    return schema_obj
+    return _apply_at_schema_path(schema_obj, path=path, schemas=schemas, apply=apply)
 
 
-def _resolve_schema_ref(ref_value: str, schemas: Optional[dict[str, Any]]) -> Optional[Json]:
-    if schemas is None:
-        return None
+@lru_cache(maxsize=4096)
+def _local_schema_ref_name(ref_value: str) -> Optional[str]:
+    """
+    Schema name targeted by a local '#/components/schemas/<name>[/...]' ref, else None.
+    Any pointer segments after the name are ignored.
+    """
+    if ref_value.startswith(_SCHEMA_REF_PREFIX):
+        name = ref_value[len(_SCHEMA_REF_PREFIX) :]
+        # The overwhelmingly common shape: a plain name with nothing to unescape.
+        if name and "/" not in name and "~" not in name:
+            return name
     path_part, frag = _split_ref(ref_value)
     if path_part != "" or not frag.startswith("/components/schemas/"):
         return None
     toks = _decode_pointer_path(frag)
     if len(toks) >= 3 and toks[0] == "components" and toks[1] == "schemas":
-        return schemas.get(toks[2])
+        return toks[2]
     return None
 
 
+def _resolve_schema_ref(ref_value: str, schemas: Optional[dict[str, Any]]) -> Optional[Json]:
+    if schemas is None:
+        return None
+    name = _local_schema_ref_name(ref_value)
+    return None if name is None else schemas.get(name)
+
+
 def _apply_oneof_filter_to_operation_paths(
     doc: Json,
     *,
@@ -1410,30 +1715,38 @@ def _apply_oneof_filter_to_operation_paths(
         if parent is None or parent_key is None:
             continue
 
+        # A resolved $ref hands us the components.schemas entry itself; the filtered
+        # result goes into the operation's slot, so it must be a copy, not that entry.
+        from_component = False
         if isinstance(node, dict) and isinstance(node.get("$ref"), str):
             resolved = _resolve_schema_ref(node["$ref"], schemas)
             if isinstance(resolved, dict):
                 node = resolved
+                from_component = True
 
         if keep:
+            # Allow mode copies every container, so it never aliases the component.
             parent[parent_key] = _filter_oneof_lists_allow(node, keep_types=targets)
         else:
-            parent[parent_key] = _filter_oneof_lists(node, remove_types=targets)
+            parent[parent_key] = _filter_oneof_lists(
+                node, remove_types=targets, reuse_subtrees=not from_component
+            )
 
 
-def _build_allow_field_tree(paths: list[list[str]]) -> dict[str, Any]:
+def _build_field_tree(paths: list[list[str]]) -> dict[str, Any]:
+    # Nested dicts keyed by property name; True marks a leaf (the whole property is allowed
+    # or removed), which wins over any longer path underneath it.
     tree: dict[str, Any] = {}
     for segs in paths:
-        cur = tree
-        for i, s in enumerate(segs):
-            if s not in cur:
-                cur[s] = {}
-            if i == len(segs) - 1:
-                cur[s] = True
-                break
-            if cur[s] is True:
+        if not segs:
+            continue
+        cur: Any = tree
+        for s in segs[:-1]:
+            cur = cur.setdefault(s, {})
+            if cur is True:
                 break
-            cur = cur[s]
+        else:
+            cur[segs[-1]] = True
     return tree
 
 
@@ -1441,92 +1754,110 @@ def _apply_allow_fields(schema: Json, allow_paths: list[list[str]]) -> None:
     if not allow_paths:
         return
 
-    tree = _build_allow_field_tree(allow_paths)
+    tree = _build_field_tree(allow_paths)
 
-    def _prune(node: Json, *, allow_tree: dict[str, Any]) -> None:
+    # Explicit work stack in the same order the recursive walk used: a node's combinator
+    # items are pruned first, then its properties (_ALLOW_PROPS frame), then the kept ones.
+    work: list[tuple[int, Json, dict[str, Any]]] = [(_VISIT, schema, tree)]
+    while work:
+        op, node, allow_tree = work.pop()
         if not isinstance(node, dict):
-            return
+            continue
 
-        for key in ("allOf", "anyOf", "oneOf"):
-            v = node.get(key)
-            if isinstance(v, list):
-                for item in v:
-                    _prune(item, allow_tree=allow_tree)
+        if op == _VISIT:
+            work.append((_ALLOW_PROPS, node, allow_tree))
+            for key in ("oneOf", "anyOf", "allOf"):
+                v = node.get(key)
+                if isinstance(v, list):
+                    work.extend((_VISIT, item, allow_tree) for item in reversed(v))
+            continue
 
         props = node.get("properties")
         if not isinstance(props, dict):
-            return
+            continue
 
+        # Kept properties follow the manifest's order, so walk allow_tree rather than props.
         new_props: dict[str, Any] = {}
-        for prop_name, allow_spec in allow_tree.items():
-            if prop_name not in props:
-                continue
-            if allow_spec is True:
-                new_props[prop_name] = props[prop_name]
-            else:
-                new_props[prop_name] = props[prop_name]
-                _prune(new_props[prop_name], allow_tree=allow_spec)
+        nested: list[tuple[int, Json, dict[str, Any]]] = []
+        if not props.keys().isdisjoint(allow_tree):
+            for prop_name, allow_spec in allow_tree.items():
+                if prop_name not in props:
+                    continue
+                value = props[prop_name]
+                new_props[prop_name] = value
+                if allow_spec is not True:
+                    nested.append((_VISIT, value, allow_spec))
 
         node["properties"] = new_props
         req = node.get("required")
         if isinstance(req, list):
             node["required"] = [x for x in req if x in new_props]
+        work.extend(reversed(nested))
 
-    _prune(schema, allow_tree=tree)
 
-def _remove_property_path(schema: Json, segments: list[str]) -> None:
+def _remove_property_paths(schema: Json, paths: list[list[str]]) -> None:
     """
-    Best-effort removal of a nested property path from a schema object.
+    Best-effort removal of nested property paths from a schema object.
 
     We only understand object schemas with "properties", and we will also walk
-    combinators (allOf/anyOf/oneOf) to catch common patterns.
+    combinators (allOf/anyOf/oneOf) to catch common patterns. All paths are removed in
+    one descent, following shared prefixes once.
     """
-    if not segments:
-        return
-    if isinstance(schema, dict):
-        # Apply to combinators first (fields often get introduced via allOf).
+    tree = _build_field_tree(paths)
+    work: list[tuple[Json, dict[str, Any]]] = [(schema, tree)] if tree else []
+    while work:
+        node, remove_tree = work.pop()
+        if not isinstance(node, dict):
+            continue
+
+        # Apply to combinators too (fields often get introduced via allOf).
         for key in ("allOf", "anyOf", "oneOf"):
-            v = schema.get(key)
+            v = node.get(key)
             if isinstance(v, list):
-                for item in v:
-                    _remove_property_path(item, segments)
+                work.extend((item, remove_tree) for item in v)
 
-        props = schema.get("properties")
+        props = node.get("properties")
         if not isinstance(props, dict):
-            return
+            continue
 
-        head = segments[0]
-        if len(segments) == 1:
-            if head in props:
-                del props[head]
-            req = schema.get("required")
+        removed: list[str] = []
+        for head, sub_tree in remove_tree.items():
+            if sub_tree is True:
+                props.pop(head, None)
+                removed.append(head)
+            else:
+                work.append((props.get(head), sub_tree))
+        if removed:
+            req = node.get("required")
             if isinstance(req, list):
-                schema["required"] = [x for x in req if x != head]
-            return
-
-        child = props.get(head)
-        _remove_property_path(child, segments[1:])
+                node["required"] = [x for x in req if x not in removed]
 
 
-def _decode_pointer_path(pointer: str) -> list[str]:
+@lru_cache(maxsize=4096)
+def _decode_pointer_path(pointer: str) -> tuple[str, ...]:
+    # Cached, so the result is a tuple; callers only read it.
     if pointer in ("", None):
-        return []
+        return ()
     if not pointer.startswith("/"):
-        return []
-    return [_decode_json_pointer_token(t) for t in pointer.lstrip("/").split("/") if t != ""]
+        return ()
+    return tuple(_decode_json_pointer_token(t) for t in pointer.lstrip("/").split("/") if t != "")
+
+
+_BRACKET_TOKEN_RE = re.compile(r"^([^\[]+)((?:\[\d+\])+)$")
+_BRACKET_INDEX_RE = re.compile(r"\[(\d+)\]")
 
 
 def _expand_bracket_indexes(token: str, *, context: str) -> list[str]:
     # Allow tokens like "oneOf[1]" or "items[0][2]" as a shorthand.
     if "[" not in token:
         return [token]
-    match = re.match(r"^([^\[]+)((\[\d+\])+)$$", token)
+    match = _BRACKET_TOKEN_RE.match(token)
     if not match:
         raise RuntimeError(f"Invalid bracket index token {token!r} in {context}.")
     name = match.group(1)
     if not name:
         raise RuntimeError(f"Invalid bracket index token {token!r} in {context}.")
-    indexes = re.findall(r"\[(\d+)\]", match.group(2))
+    indexes = _BRACKET_INDEX_RE.findall(match.group(2))
     return [name, *indexes]
 
 
@@ -1571,169 +1902,211 @@ def _resolve_pointer_with_refs(
     return cur
 
 
-def _strip_refs_to_denied_types(
-    node: Json,
-    *,
-    deny_types: set[str],
-    allow_types: Optional[set[str]] = None,
-) -> Json:
-    """
-    Replace internal $refs to denied component schemas with `{}` (any schema).
+_SCHEMA_LIST_KEYS: frozenset[str] = frozenset(
+    {
+        # JSON Schema combinators
+        "oneOf",
+        "anyOf",
+        "allOf",
+        # JSON Schema 2020-12 tuple typing keyword (OpenAPI 3.1 uses JSON Schema vocab)
+        "prefixItems",
+    }
+)
 
-    This keeps the output spec structurally usable while ensuring those types
-    won't be rendered as full definitions.
-    """
-    if isinstance(node, list):
-        return [_strip_refs_to_denied_types(v, deny_types=deny_types) for v in node]
+
+def _is_empty_array_schema(node: Json) -> bool:
+    # An array schema (by "type" or just by having "items") whose items is `{}`. Having an
+    # `items` key at all already makes it an array schema, so "type" never needs checking.
     if not isinstance(node, dict):
-        return node
+        return False
+    items = node.get("items")
+    return isinstance(items, dict) and not items
+
+
+def _map_list_items(items: list[Json], fn: Callable[[Json], Json]) -> list[Json]:
+    # [fn(v) for v in items], except that scalars are kept without calling fn and items
+    # itself is returned when nothing changed, so the cleanup passes below only copy the
+    # spine of subtrees they actually edit.
+    out: Optional[list[Json]] = None
+    for i, v in enumerate(items):
+        new_v = fn(v) if isinstance(v, (dict, list)) else v
+        if out is None:
+            if new_v is v:
+                continue
+            out = items[:i]
+        out.append(new_v)
+    return items if out is None else out
 
-    if "$ref" in node and isinstance(node.get("$ref"), str):
-        ref_value = node["$ref"]
-        path_part, frag = _split_ref(ref_value)
-        if path_part == "" and frag.startswith("/components/schemas/"):
-            toks = _decode_pointer_path(frag)
-            # tokens: ["components","schemas","TypeName", ...]
-            if len(toks) >= 3 and toks[0] == "components" and toks[1] == "schemas":
-                tname = toks[2]
-                if (allow_types is not None and tname not in allow_types) or tname in deny_types:
-                    siblings = {k: v for k, v in node.items() if k != "$ref"}
-                    if siblings:
-                        # Keep any non-ref constraints, just drop the ref itself.
-                        return _strip_refs_to_denied_types(
-                            siblings, deny_types=deny_types, allow_types=allow_types
-                        )
-                    return {}
 
-    out: dict[str, Any] = {}
+def _map_dict_values(node: dict[str, Any], fn: Callable[[str, Json], Json]) -> dict[str, Any]:
+    # {k: fn(k, v)} with the same scalar and copy-on-change rules as _map_list_items.
+    out: Optional[dict[str, Any]] = None
     for k, v in node.items():
-        out[k] = _strip_refs_to_denied_types(v, deny_types=deny_types, allow_types=allow_types)
-    return out
-
-
-_SCHEMA_LIST_KEYS: set[str] = {
-    # JSON Schema combinators
-    "oneOf",
-    "anyOf",
-    "allOf",
-    # JSON Schema 2020-12 tuple typing keyword (OpenAPI 3.1 uses JSON Schema vocab)
-    "prefixItems",
-}
+        new_v = fn(k, v) if isinstance(v, (dict, list)) else v
+        if out is None:
+            if new_v is v:
+                continue
+            out = {}
+            for prev_k, prev_v in node.items():
+                if prev_k == k:
+                    break
+                out[prev_k] = prev_v
+        out[k] = new_v
+    return node if out is None else out
+
+
+def _splice_nested_schema_list(items: list[Json], key: str) -> list[Json]:
+    # Replace each `{key: [...]}` item (exactly one key) with the items of its list;
+    # items itself is returned when there is nothing to splice.
+    out: Optional[list[Json]] = None
+    for i, item in enumerate(items):
+        if isinstance(item, dict) and len(item) == 1:
+            try:
+                nested_list = item[key]
+            except KeyError:
+                pass
+            else:
+                if isinstance(nested_list, list):
+                    if out is None:
+                        out = items[:i]
+                    out.extend(nested_list)
+                    continue
+        if out is not None:
+            out.append(item)
+    return items if out is None else out
 
 
-def _prune_empty_schema_objects(node: Json, *, parent_key: Optional[str] = None) -> Json:
+def _flatten_nested_schema_lists(node: Json, *, parent_key: Optional[str] = None) -> Json:
     """
-    Remove `{}` elements introduced by filtering from schema lists like oneOf/anyOf/allOf.
+    Flatten nested oneOf/anyOf/allOf lists to reduce nesting noise from generators.
 
-    We intentionally scope this to known schema-list keywords to avoid removing
-    meaningful empty objects elsewhere (e.g. examples payloads).
+    Subtrees with nothing to flatten are returned as-is rather than copied.
     """
     if isinstance(node, list):
-        pruned = [_prune_empty_schema_objects(v, parent_key=parent_key) for v in node]
+        items = _map_list_items(node, lambda v: _flatten_nested_schema_lists(v, parent_key=parent_key))
         if parent_key in _SCHEMA_LIST_KEYS:
-            pruned = [v for v in pruned if not (isinstance(v, dict) and len(v) == 0)]
-        return pruned
+            return _splice_nested_schema_list(items, parent_key)
+        return items
 
     if isinstance(node, dict):
-        out: dict[str, Any] = {}
-        for k, v in node.items():
-            out[k] = _prune_empty_schema_objects(v, parent_key=str(k) if isinstance(k, str) else None)
-
-        # If we pruned everything out of a schema list, drop the keyword entirely.
-        for key in _SCHEMA_LIST_KEYS:
-            v = out.get(key)
-            if isinstance(v, list) and len(v) == 0:
-                del out[key]
-        return out
+        # A schema-list value is spliced by the list branch above (parent_key is its key),
+        # and its items were already flattened bottom-up, so no second pass is needed here.
+        return _map_dict_values(
+            node, lambda k, v: _flatten_nested_schema_lists(v, parent_key=k if isinstance(k, str) else None)
+        )
 
     return node
 
 
-def _is_empty_array_schema(node: Json) -> bool:
-    if not isinstance(node, dict):
-        return False
-    type_value = node.get("type")
-    is_array = type_value == "array" or (isinstance(type_value, list) and "array" in type_value) or "items" in node
-    if not is_array:
-        return False
-    items = node.get("items")
-    return isinstance(items, dict) and len(items) == 0
-
-
-def _prune_empty_array_items(node: Json, *, parent_key: Optional[str] = None) -> Json:
+def _strip_denied_refs_and_flatten(
+    node: Json,
+    *,
+    deny_types: set[str],
+    allow_types: Optional[set[str]] = None,
+    parent_key: Optional[str] = None,
+) -> Json:
     """
-    Drop array schemas with empty `items` from schema lists and object properties.
+    Replace internal $refs to denied component schemas with `{}` (any schema), flattening
+    nested oneOf/anyOf/allOf lists in the same rebuild.
+
+    The ref scrub keeps the output spec structurally usable while ensuring those types
+    won't be rendered as full definitions. Refs are scrubbed on the way down and lists are
+    flattened on the way up, so this equals a scrub pass followed by a flatten pass.
+    Subtrees with nothing to change are returned as-is rather than copied.
     """
     if isinstance(node, list):
-        pruned = [_prune_empty_array_items(v, parent_key=parent_key) for v in node]
+        items = _map_list_items(
+            node,
+            lambda v: _strip_denied_refs_and_flatten(
+                v, deny_types=deny_types, allow_types=None, parent_key=parent_key
+            ),
+        )
         if parent_key in _SCHEMA_LIST_KEYS:
-            pruned = [v for v in pruned if not _is_empty_array_schema(v)]
-        return pruned
+            return _splice_nested_schema_list(items, parent_key)
+        return items
+    if not isinstance(node, dict):
+        return node
 
-    if isinstance(node, dict):
-        out: dict[str, Any] = {}
-        for k, v in node.items():
-            out[k] = _prune_empty_array_items(v, parent_key=str(k) if isinstance(k, str) else None)
-
-        props = out.get("properties")
-        if isinstance(props, dict):
-            for prop_name in list(props.keys()):
-                if _is_empty_array_schema(props[prop_name]):
-                    del props[prop_name]
-                    req = out.get("required")
-                    if isinstance(req, list):
-                        out["required"] = [x for x in req if x != prop_name]
-        return out
+    if "$ref" in node and isinstance(node.get("$ref"), str):
+        ref_value = node["$ref"]
+        tname = _local_schema_ref_name(ref_value)
+        if tname is not None:
+            if (allow_types is not None and tname not in allow_types) or tname in deny_types:
+                siblings = {k: v for k, v in node.items() if k != "$ref"}
+                if siblings:
+                    # Keep any non-ref constraints, just drop the ref itself.
+                    return _strip_denied_refs_and_flatten(
+                        siblings, deny_types=deny_types, allow_types=allow_types, parent_key=parent_key
+                    )
+                return {}
 
-    return node
+    return _map_dict_values(
+        node,
+        lambda k, v: _strip_denied_refs_and_flatten(
+            v, deny_types=deny_types, allow_types=allow_types, parent_key=k if isinstance(k, str) else None
+        ),
+    )
 
 
-def _flatten_nested_schema_lists(node: Json, *, parent_key: Optional[str] = None) -> Json:
+def _prune_empty_schema_list(items: list[Json], *, parent_key: Optional[str]) -> tuple[list[Json], bool]:
+    # Returns the pruned list and whether dropping `{}` items alone emptied it; only then is
+    # the enclosing keyword removed, while a list emptied by the empty-array rule stays `[]`.
+    pruned = _map_list_items(items, lambda v: _prune_empty_schemas(v, parent_key=parent_key))
+    if parent_key not in _SCHEMA_LIST_KEYS:
+        return pruned, False
+    if any(isinstance(v, dict) and len(v) == 0 for v in pruned):
+        pruned = [v for v in pruned if not (isinstance(v, dict) and len(v) == 0)]
+    if not pruned:
+        return pruned, True
+    if any(_is_empty_array_schema(v) for v in pruned):
+        pruned = [v for v in pruned if not _is_empty_array_schema(v)]
+    return pruned, False
+
+
+def _prune_empty_schemas(node: Json, *, parent_key: Optional[str] = None) -> Json:
     """
-    Flatten nested oneOf/anyOf/allOf lists to reduce nesting noise from generators.
+    Remove `{}` elements introduced by filtering from schema lists like oneOf/anyOf/allOf
+    (dropping the keyword if that empties it), then drop array schemas with empty `items`
+    from schema lists and object properties.
+
+    We intentionally scope this to known schema-list keywords to avoid removing
+    meaningful empty objects elsewhere (e.g. examples payloads). Subtrees with nothing
+    to prune are returned as-is rather than copied.
     """
     if isinstance(node, list):
-        flattened = [_flatten_nested_schema_lists(v, parent_key=parent_key) for v in node]
-        if parent_key in _SCHEMA_LIST_KEYS:
-            out: list[Json] = []
-            for item in flattened:
-                if (
-                    isinstance(item, dict)
-                    and isinstance(item.get(parent_key), list)
-                    and set(item.keys()) == {parent_key}
-                ):
-                    nested_list = item.get(parent_key)
-                    if isinstance(nested_list, list):
-                        out.extend(nested_list)
-                        continue
-                out.append(item)
-            return out
-        return flattened
+        return _prune_empty_schema_list(node, parent_key=parent_key)[0]
 
-    if isinstance(node, dict):
-        out: dict[str, Any] = {}
-        for k, v in node.items():
-            out[k] = _flatten_nested_schema_lists(v, parent_key=str(k) if isinstance(k, str) else None)
+    if not isinstance(node, dict):
+        return node
 
-        for key in _SCHEMA_LIST_KEYS:
-            v = out.get(key)
-            if isinstance(v, list):
-                flattened: list[Json] = []
-                for item in v:
-                    if (
-                        isinstance(item, dict)
-                        and isinstance(item.get(key), list)
-                        and set(item.keys()) == {key}
-                    ):
-                        nested_list = item.get(key)
-                        if isinstance(nested_list, list):
-                            flattened.extend(nested_list)
-                            continue
-                    flattened.append(item)
-                out[key] = flattened
-        return out
+    emptied_keys: list[str] = []
 
-    return node
+    def prune_value(k: str, v: Json) -> Json:
+        key = str(k) if isinstance(k, str) else None
+        if not isinstance(v, list):
+            return _prune_empty_schemas(v, parent_key=key)
+        pruned, emptied = _prune_empty_schema_list(v, parent_key=key)
+        if emptied:
+            emptied_keys.append(k)
+        return pruned
+
+    out = _map_dict_values(node, prune_value)
+
+    # If we pruned every `{}` out of a schema list, drop the keyword entirely.
+    if emptied_keys:
+        out = {k: v for k, v in out.items() if k not in emptied_keys}
+
+    props = out.get("properties")
+    if isinstance(props, dict):
+        dropped = [name for name, v in props.items() if _is_empty_array_schema(v)]
+        if dropped:
+            if out is node:
+                out = dict(node)
+            out["properties"] = {name: v for name, v in props.items() if name not in dropped}
+            req = out.get("required")
+            if isinstance(req, list):
+                out["required"] = [x for x in req if x not in dropped]
+    return out
 
 
 def _collect_schema_refs(
@@ -1744,39 +2117,31 @@ def _collect_schema_refs(
     in_schema_def: bool = False,
     parent_key: Optional[str] = None,
 ) -> None:
-    if in_schema_def and skip_schema_definitions:
-        return
-
-    if isinstance(node, dict):
-        ref_value = node.get("$ref")
-        if isinstance(ref_value, str):
-            path_part, frag = _split_ref(ref_value)
-            if path_part == "" and frag.startswith("/components/schemas/"):
-                toks = _decode_pointer_path(frag)
-                if len(toks) >= 3 and toks[0] == "components" and toks[1] == "schemas":
-                    refs.add(toks[2])
-
-        for k, v in node.items():
-            next_in_schema_def = in_schema_def or (parent_key == "components" and k == "schemas")
-            _collect_schema_refs(
-                v,
-                refs=refs,
-                skip_schema_definitions=skip_schema_definitions,
-                in_schema_def=next_in_schema_def,
-                parent_key=k if isinstance(k, str) else None,
-            )
-        return
+    # Explicit stack of (node, inside components.schemas, key the node was found under).
+    stack: list[tuple[Json, bool, Optional[str]]] = [(node, in_schema_def, parent_key)]
+    while stack:
+        current, in_def, key = stack.pop()
+        if in_def and skip_schema_definitions:
+            continue
 
-    if isinstance(node, list):
-        for v in node:
-            _collect_schema_refs(
-                v,
-                refs=refs,
-                skip_schema_definitions=skip_schema_definitions,
-                in_schema_def=in_schema_def,
-                parent_key=parent_key,
-            )
-        return
+        if isinstance(current, dict):
+            ref_value = current.get("$ref")
+            if isinstance(ref_value, str):
+                schema_name = _local_schema_ref_name(ref_value)
+                if schema_name is not None:
+                    refs.add(schema_name)
+
+            for k, v in current.items():
+                if isinstance(v, (dict, list)):
+                    stack.append(
+                        (
+                            v,
+                            in_def or (key == "components" and k == "schemas"),
+                            k if isinstance(k, str) else None,
+                        )
+                    )
+        elif isinstance(current, list):
+            stack.extend((v, in_def, key) for v in current if isinstance(v, (dict, list)))
 
 
 def _prune_unused_schemas(doc: Json) -> Json:
@@ -1792,6 +2157,8 @@ def _prune_unused_schemas(doc: Json) -> Json:
     initial_refs: set[str] = set()
     _collect_schema_refs(doc, refs=initial_refs, skip_schema_definitions=True)
 
+    # DFS over the schema ref graph. Each schema's refs are collected once, when it is first
+    # reached, so unreachable schemas are never scanned.
     reachable: set[str] = set()
     stack = list(initial_refs)
     while stack:
@@ -1804,9 +2171,8 @@ def _prune_unused_schemas(doc: Json) -> Json:
         reachable.add(name)
         inner_refs: set[str] = set()
         _collect_schema_refs(schema_obj, refs=inner_refs, skip_schema_definitions=False)
-        for ref_name in inner_refs:
-            if ref_name not in reachable:
-                stack.append(ref_name)
+        inner_refs -= reachable
+        stack.extend(inner_refs)
 
     for name in list(schemas.keys()):
         if name not in reachable:
@@ -1879,71 +2245,58 @@ def _apply_manifest_filters(doc: Json, *, manifest_path: Path) -> Json:
                 schema_obj = schemas.get(tname)
                 if not isinstance(schema_obj, dict):
                     continue
-                for segs in paths:
-                    _remove_property_path(schema_obj, segs)
+                _remove_property_paths(schema_obj, paths)
 
-            # Apply enum allow/deny filters.
-            for owner, rules in allow_enums.items():
-                schema_obj = schemas.get(owner)
-                if not isinstance(schema_obj, dict):
-                    continue
-                for path, values in rules:
-                    schema_obj = _apply_enum_filter_to_subtree(
-                        schema_obj, path=path, schemas=schemas, allow_values=values
-                    )
-                schemas[owner] = schema_obj
-
-            for owner, rules in deny_enums.items():
-                schema_obj = schemas.get(owner)
-                if not isinstance(schema_obj, dict):
-                    continue
-                for path, values in rules:
-                    schema_obj = _apply_enum_filter_to_subtree(
-                        schema_obj, path=path, schemas=schemas, deny_values=values
-                    )
-                schemas[owner] = schema_obj
-
-            # Apply description overrides (allow = set, deny = remove).
-            for owner, rules in allow_desc.items():
-                schema_obj = schemas.get(owner)
-                if not isinstance(schema_obj, dict):
-                    continue
-                for path, desc in rules:
-                    schema_obj = _apply_description_override_to_subtree(
-                        schema_obj, path=path, schemas=schemas, description=desc
-                    )
-                schemas[owner] = schema_obj
-
-            for owner, rules in deny_desc.items():
-                schema_obj = schemas.get(owner)
-                if not isinstance(schema_obj, dict):
-                    continue
-                for path, desc in rules:
-                    schema_obj = _apply_description_override_to_subtree(
-                        schema_obj, path=path, schemas=schemas, description=None if desc is None else desc
-                    )
-                schemas[owner] = schema_obj
-
-            # Apply oneOf allowlists first, then denylists.
-            for owner, rules in allow_oneof.items():
-                schema_obj = schemas.get(owner)
-                if not isinstance(schema_obj, dict):
-                    continue
-                for path, targets in rules:
-                    schema_obj = _apply_oneof_filter_to_subtree(
-                        schema_obj, path=path, schemas=schemas, keep_types=targets
-                    )
-                schemas[owner] = schema_obj
-
-            for owner, rules in deny_oneof.items():
-                schema_obj = schemas.get(owner)
-                if not isinstance(schema_obj, dict):
-                    continue
-                for path, targets in rules:
-                    schema_obj = _apply_oneof_filter_to_subtree(
-                        schema_obj, path=path, schemas=schemas, remove_types=targets
-                    )
-                schemas[owner] = schema_obj
+            # Per-type rules, one category at a time: enum allow/deny filters, description
+            # overrides (allow = set, deny = remove), then oneOf allowlists before denylists.
+            # A rule's path can follow a $ref into another type, so each category is applied to
+            # every owner before the next one starts.
+            rule_passes = (
+                (
+                    allow_enums,
+                    lambda obj, path, values: _apply_enum_filter_to_subtree(
+                        obj, path=path, schemas=schemas, allow_values=values
+                    ),
+                ),
+                (
+                    deny_enums,
+                    lambda obj, path, values: _apply_enum_filter_to_subtree(
+                        obj, path=path, schemas=schemas, deny_values=values
+                    ),
+                ),
+                (
+                    allow_desc,
+                    lambda obj, path, desc: _apply_description_override_to_subtree(
+                        obj, path=path, schemas=schemas, description=desc
+                    ),
+                ),
+                (
+                    deny_desc,
+                    lambda obj, path, desc: _apply_description_override_to_subtree(
+                        obj, path=path, schemas=schemas, description=desc
+                    ),
+                ),
+                (
+                    allow_oneof,
+                    lambda obj, path, targets: _apply_oneof_filter_to_subtree(
+                        obj, path=path, schemas=schemas, keep_types=targets
+                    ),
+                ),
+                (
+                    deny_oneof,
+                    lambda obj, path, targets: _apply_oneof_filter_to_subtree(
+                        obj, path=path, schemas=schemas, remove_types=targets
+                    ),
+                ),
+            )
+            for rules_by_owner, apply_rule in rule_passes:
+                for owner, rules in rules_by_owner.items():
+                    schema_obj = schemas.get(owner)
+                    if not isinstance(schema_obj, dict):
+                        continue
+                    for path, payload in rules:
+                        schema_obj = apply_rule(schema_obj, path, payload)
+                    schemas[owner] = schema_obj
 
             # Apply path-based oneOf filters (operation response schemas, etc).
             _apply_oneof_filter_to_operation_paths(
@@ -1955,10 +2308,16 @@ def _apply_manifest_filters(doc: Json, *, manifest_path: Path) -> Json:
 
     # Best-effort: scrub any internal $refs that would now point at missing definitions
     # then prune `{}` branches introduced by the scrub in schema combinators.
-    doc = _strip_refs_to_denied_types(doc, deny_types=removed_types, allow_types=allow_types or None)
-    doc = _flatten_nested_schema_lists(doc)
-    doc = _prune_empty_schema_objects(doc)
-    doc = _prune_empty_array_items(doc)
+    # These passes return unchanged subtrees as-is, so any object sharing left in doc
+    # survives them and _apply_additive_patches would edit every alias in place. The
+    # filters above must therefore never store one node in two slots (see
+    # _apply_oneof_filter_to_operation_paths).
+    if removed_types or allow_types:
+        doc = _strip_denied_refs_and_flatten(doc, deny_types=removed_types, allow_types=allow_types or None)
+    else:
+        # No ref can point at a removed type; only re-flatten lists the filters above touched.
+        doc = _flatten_nested_schema_lists(doc)
+    doc = _prune_empty_schemas(doc)
     return _prune_unused_schemas(doc)
 
 
@@ -2136,15 +2495,17 @@ def main(argv: list[str]) -> int:
     try:
         if args.endpoint:
             entry_abs = entrypoint.resolve()
+            documents = DocumentCache()
+            entry_doc = documents.load(entry_abs)
             if args.mode == "inline":
                 inliner = RefInliner(
                     inline_internal_refs=bool(args.inline_internal_refs),
                     on_cycle=str(args.on_cycle),
                     max_depth=int(args.max_depth),
+                    documents=documents,
                 )
-                entry_doc = inliner._load_cached(entry_abs)
                 out_doc = _selective_megaspec(
-                    deepcopy(entry_doc),
+                    entry_doc,
                     entry_file=entry_abs,
                     inliner=inliner,
                     endpoints=list(args.endpoint),
@@ -2154,10 +2515,10 @@ def main(argv: list[str]) -> int:
                     inline_internal_refs=bool(args.inline_internal_refs),
                     on_cycle=str(args.on_cycle),
                     max_depth=int(args.max_depth),
+                    documents=documents,
                 )
-                entry_doc = bundler._load_cached(entry_abs)
                 out_doc = _selective_megaspec_bundle(
-                    deepcopy(entry_doc),
+                    entry_doc,
                     entry_file=entry_abs,
                     bundler=bundler,
                     endpoints=list(args.endpoint),
@@ -2189,13 +2550,23 @@ def main(argv: list[str]) -> int:
         _eprint(f"error: {e}")
         return 1
 
-    indent = None if args.no_pretty else 2
-    content = json.dumps(out_doc, indent=indent, ensure_ascii=True, sort_keys=False) + ("\n" if indent else "")
+    # json.dumps rather than json.dump: dump streams through the pure-Python encoder, which
+    # is several times slower than building the string with the C one.
+    if args.no_pretty:
+        content = json.dumps(out_doc, ensure_ascii=True, sort_keys=False, separators=(",", ":"))
+        trailer = ""
+    else:
+        content = json.dumps(out_doc, indent=2, ensure_ascii=True, sort_keys=False)
+        trailer = "\n"
 
+    # Write the trailing newline separately instead of copying the whole document to append it.
     if args.output:
-        Path(args.output).write_text(content, encoding="utf-8")
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.write(trailer)
     else:
         sys.stdout.write(content)
+        sys.stdout.write(trailer)
     return 0
 
 
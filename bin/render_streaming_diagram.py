@@ -8,24 +8,33 @@ Usage:
     python bin/render_streaming_diagram.py > diagram.svg
 
 Pass ``--output`` to write the SVG to a specific file. Self-referential edges
-and strongly connected cycles are rendered as repeatable segments.
+are rendered as repeatable segments; any other edge back into the current path
+is drawn as a ``↺`` terminal naming the event it returns to.
+
+Rendered SVGs are cached under ``.cache/diagrams/``, keyed by the graph, this
+script and the pyrailroad version, so unchanged diagrams are not rebuilt.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
+import os
 import sys
 from collections.abc import Iterable
-from itertools import chain
-from typing import Dict, List, Sequence
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Sequence, Set, Tuple
+
+from _schema_cache import write_text_atomic
 
-from pyrailroad.elements import (
-    Choice,
-    Diagram,
-    OneOrMore,
-    Sequence as RRSequence,
-    Terminal,
-)
+ROOT = Path(__file__).resolve().parent.parent
+DIAGRAM_CACHE_DIR = ROOT / ".cache" / "diagrams"
+DIAGRAM_CACHE_KEEP = 4
+
+if TYPE_CHECKING:
+    from pyrailroad.elements import Diagram
 
 Graph = Dict[str, List[str]]
 
@@ -82,8 +91,11 @@ simple_event_tree: Graph = {
     ]
 }
 
-def normalize_graph(raw: Graph) -> Graph:
-    """Normalize the adjacency map and deduplicate successor lists."""
+def normalize_graph(raw: Graph) -> Tuple[Graph, Dict[str, int]]:
+    """Normalize the adjacency map and deduplicate successor lists.
+
+    Also returns each event's in-degree, keyed in graph order.
+    """
     normalized: Graph = {}
     for raw_key, raw_values in raw.items():
         key = str(raw_key)
@@ -98,84 +110,204 @@ def normalize_graph(raw: Graph) -> Graph:
                 raise SystemExit(
                     f"Invalid successor list for '{key}': expected list or string."
                 )
-            deduped: List[str] = []
-            for value in raw_values:
-                text = str(value)
-                if text not in deduped:
-                    deduped.append(text)
-            normalized[key] = deduped
+            # dict.fromkeys keeps the first occurrence of each successor, in order.
+            normalized[key] = list(dict.fromkeys(str(value) for value in raw_values))
             continue
         raise SystemExit(
             f"Invalid successor list for '{key}': expected list or string."
         )
 
-    # Ensure every referenced successor exists in the map.
-    referenced: Set[str] = set(chain.from_iterable(normalized.values()))
-    for missing in referenced:
-        normalized.setdefault(missing, [])
+    # One pass over the edges counts in-degrees; successors without an entry of
+    # their own are appended in first-reference order.
+    indegree: Dict[str, int] = dict.fromkeys(normalized, 0)
+    for successors in normalized.values():
+        for successor in successors:
+            indegree[successor] = indegree.get(successor, 0) + 1
 
-    return normalized
+    # Ensure every referenced successor exists in the map. Following indegree's
+    # order keeps the normalized graph (and its fingerprint) deterministic.
+    for event in indegree:
+        normalized.setdefault(event, [])
 
+    return normalized, indegree
 
-def find_start_events(graph: Graph) -> List[str]:
+
+def find_start_events(indegree: Dict[str, int]) -> List[str]:
     """Return events with no incoming edges (or all events as fallback)."""
-    successors = set(chain.from_iterable(graph.values()))
-    candidates = [event for event in graph if event not in successors]
-    return candidates or sorted(graph.keys())
+    candidates = [event for event, count in indegree.items() if count == 0]
+    return candidates or sorted(indegree)
+
+
+def join_choices(items: List[object]) -> object:
+    """Wrap several alternatives in a ``Choice``; pass a single one through."""
+    from pyrailroad.elements import Choice
+
+    return items[0] if len(items) == 1 else Choice(0, *items)
+
+
+def join_sequence(head: object, tail: object) -> object:
+    """Put ``head`` before ``tail``, splicing ``tail`` in if it is a sequence.
+
+    Straight-line chains become one flat sequence instead of nesting one
+    level per event; the layout is the same.
+    """
+    from pyrailroad.elements import Sequence as RRSequence
+
+    if isinstance(tail, RRSequence):
+        return RRSequence(head, *tail.items)
+    return RRSequence(head, tail)
 
 
 def build_node_diagram(
-    node: str,
+    start: str,
     graph: Graph,
-    stack: Sequence[str],
     cache: Dict[str, object],
 ) -> object:
-    """Render a node and its successors while avoiding infinite recursion."""
-    if node in cache:
-        return cache[node]
-
-    successors = graph.get(node, [])
-    self_loop = node in successors
-    non_self_successors = [succ for succ in successors if succ != node]
-
-    base: object = Terminal(node)
-    if self_loop:
-        base = OneOrMore(base)
-
-    if not non_self_successors:
-        cache[node] = base
-        return base
-
-    tail_items: List[object] = []
-    for successor in non_self_successors:
-        if successor in stack:
-            tail_items.append(Terminal(f"{successor} ↺"))
-        else:
-            tail_items.append(
-                build_node_diagram(successor, graph, (*stack, node), cache)
-            )
-
-    tail = tail_items[0] if len(tail_items) == 1 else Choice(0, *tail_items)
-    result = RRSequence(base, tail)
-    cache[node] = result
+    """Render a node and its successors while avoiding infinite recursion.
+
+    Walks depth-first with an explicit frame stack, so long event chains cannot
+    hit the recursion limit. Edges back to an event on the current path are
+    drawn as ``↺`` terminals instead of being followed.
+    """
+    from pyrailroad.elements import OneOrMore, Terminal
+
+    if start in cache:
+        return cache[start]
+
+    on_path: Set[str] = set()
+    # (event, its own element, successors other than itself, built tail items)
+    frames: List[Tuple[str, object, List[str], List[object]]] = []
+
+    def enter(node: str) -> object | None:
+        """Build ``node`` if it is a leaf, otherwise open a frame for it."""
+        successors = graph.get(node, [])
+        base: object = Terminal(node)
+        if node in successors:
+            base = OneOrMore(base)
+
+        non_self_successors = [succ for succ in successors if succ != node]
+        if not non_self_successors:
+            cache[node] = base
+            return base
+
+        on_path.add(node)
+        frames.append((node, base, non_self_successors, []))
+        return None
+
+    result = enter(start)
+    while frames:
+        node, base, successors, tail_items = frames[-1]
+        if len(tail_items) < len(successors):
+            successor = successors[len(tail_items)]
+            if successor in on_path:
+                # Not interned: pyrailroad's format() appends path and text
+                # children to the element itself, so a shared Terminal is
+                # drawn once per place it is laid out.
+                tail_items.append(Terminal(f"{successor} ↺"))
+            elif successor in cache:
+                tail_items.append(cache[successor])
+            else:
+                built = enter(successor)
+                if built is not None:
+                    tail_items.append(built)
+            continue
+
+        frames.pop()
+        on_path.discard(node)
+        result = join_sequence(base, join_choices(tail_items))
+        cache[node] = result
+        if frames:
+            frames[-1][3].append(result)
+
     return result
 
 
 def build_diagram(graph: Graph, starts: Sequence[str]) -> Diagram:
     """Compose the full railroad diagram from the adjacency graph."""
+    # pyrailroad is only imported once a diagram is actually built, so --help
+    # and on-disk cache hits skip it.
+    from pyrailroad.elements import Diagram
+
     cache: Dict[str, object] = {}
     branches = [
-        build_node_diagram(start, graph, (), cache)
+        build_node_diagram(start, graph, cache)
         for start in starts
     ]
 
     if not branches:
         raise SystemExit("No paths discovered. Check the event graph.")
 
-    root = branches[0] if len(branches) == 1 else Choice(0, *branches)
+    root = join_choices(branches)
     return Diagram(root)
 
 
+GraphFingerprint = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+def graph_fingerprint(graph: Graph) -> GraphFingerprint:
+    """Return a hashable snapshot of a normalized graph.
+
+    Event order is kept, not sorted: start events and branch order follow it.
+    """
+    return tuple((event, tuple(successors)) for event, successors in graph.items())
+
+
+@lru_cache(maxsize=8)
+def build_cached_diagram(fingerprint: GraphFingerprint, starts: Tuple[str, ...]) -> Diagram:
+    """Build (once per distinct graph) the diagram for a fingerprinted graph.
+
+    The returned ``Diagram`` is shared between callers; only write it out.
+    """
+    graph: Graph = {event: list(successors) for event, successors in fingerprint}
+    return build_diagram(graph, starts)
+
+
+def diagram_cache_key(graph: Graph, *, standalone: bool) -> str:
+    """Digest of everything the rendered SVG depends on."""
+    try:
+        renderer_version = metadata.version("pyrailroad")
+    except metadata.PackageNotFoundError:
+        renderer_version = "unknown"
+    digest = hashlib.sha256()
+    digest.update(Path(__file__).read_bytes())
+    digest.update(renderer_version.encode("utf-8"))
+    digest.update(b"standalone" if standalone else b"text")
+    digest.update(repr(graph_fingerprint(graph)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_svg(graph: Graph, starts: Sequence[str], *, standalone: bool) -> str:
+    """Return the SVG for ``graph``, from the on-disk cache when possible."""
+    cache_path = DIAGRAM_CACHE_DIR / f"{diagram_cache_key(graph, standalone=standalone)}.svg"
+    try:
+        svg = cache_path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+    else:
+        # Bump the mtime so the most recently used entries survive pruning.
+        os.utime(cache_path)
+        return svg
+
+    diagram = build_cached_diagram(graph_fingerprint(graph), tuple(starts))
+    chunks: List[str] = []
+    if standalone:
+        diagram.write_standalone(chunks.append)
+    else:
+        diagram.write_text(chunks.append)
+    svg = "".join(chunks)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    write_text_atomic(cache_path, svg)
+    entries = sorted(
+        cache_path.parent.glob("*.svg"),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for stale in entries[DIAGRAM_CACHE_KEEP:]:
+        stale.unlink(missing_ok=True)
+    return svg
+
+
 def parse_args(argv: Sequence[str]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Render the railroad diagram for streaming event transitions.",
@@ -191,15 +323,15 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
 
 def main(argv: Sequence[str]) -> None:
     args = parse_args(argv)
-    graph = normalize_graph(simple_event_tree)
-    starts = find_start_events(graph)
-    diagram = build_diagram(graph, starts)
+    graph, indegree = normalize_graph(simple_event_tree)
+    starts = find_start_events(indegree)
 
     if args.output:
+        svg = render_svg(graph, starts, standalone=True)
         with open(args.output, "w", encoding="utf-8") as fh:
-            diagram.write_standalone(fh.write)
+            fh.write(svg)
     else:
-        diagram.write_text(sys.stdout.write)
+        sys.stdout.write(render_svg(graph, starts, standalone=False))
 
 
 if __name__ == "__main__":
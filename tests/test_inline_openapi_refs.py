@@ -0,0 +1,63 @@
+"""Regression tests for bin/inline_openapi_refs.py.
+
+Run with: python -m unittest discover -s tests
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bin"))
+
+from inline_openapi_refs import RefBundler  # noqa: E402
+
+
+def _write(path: Path, doc: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(doc), encoding="utf-8")
+
+
+class SelfReferentialSharedFileTest(unittest.TestCase):
+    """A non-component file that refs itself must not be expanded forever."""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        _write(
+            root / "shared" / "Sh0.json",
+            {"type": "object", "properties": {"z": {"$ref": "./Sh0.json"}}},
+        )
+        _write(
+            root / "components" / "schemas" / "A.json",
+            {"type": "object", "properties": {"s": {"$ref": "../../shared/Sh0.json"}}},
+        )
+        self.entrypoint = root / "openapi.json"
+        _write(
+            self.entrypoint,
+            {
+                "openapi": "3.1.0",
+                "info": {"title": "t", "version": "1"},
+                "paths": {"/a": {"get": {"responses": {"200": {
+                    "description": "ok",
+                    "content": {"application/json": {"schema": {"$ref": "./components/schemas/A.json"}}},
+                }}}}},
+            },
+        )
+
+    def test_keep_cuts_the_cycle(self) -> None:
+        out = RefBundler(on_cycle="keep").bundle(self.entrypoint)
+        shared = out["components"]["schemas"]["A"]["properties"]["s"]
+        self.assertEqual(shared["properties"]["z"], {"$ref": "./Sh0.json"})
+
+    def test_error_raises(self) -> None:
+        with self.assertRaisesRegex(RuntimeError, "Cycle detected"):
+            RefBundler(on_cycle="error").bundle(self.entrypoint)
+
+
+if __name__ == "__main__":
+    unittest.main()